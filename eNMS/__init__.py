@@ -8,13 +8,20 @@ from eNMS.variables import vs
 
 
 def initialize():
-    server.register_plugins()
-    first_init = db._initialize(env)
-    if env.detect_cli():
-        return
-    form_factory._initialize()
-    controller._initialize(first_init)
-    vs.set_template_context()
+    try:
+        with vs.profile_startup("startup"):
+            with vs.profile_startup("plugins"):
+                server.register_plugins()
+            first_init = db._initialize(env)
+            if env.detect_cli():
+                return
+            with vs.profile_startup("forms"):
+                form_factory._initialize()
+            with vs.profile_startup("migration"):
+                controller._initialize(first_init)
+            vs.set_template_context()
+    finally:
+        vs.log_startup_profile()
 
 
 initialize()
@@ -8,9 +8,9 @@ from functools import wraps
 from git import Repo
 from io import BytesIO, StringIO
 from ipaddress import IPv4Network
-from json import dump, load
+from json import dump, dumps, load, loads
 from logging import info
-from operator import attrgetter, itemgetter
+from operator import itemgetter
 from os import getenv, listdir, makedirs, scandir
 from os.path import exists
 from pathlib import Path
@@ -18,13 +18,15 @@ from re import search, sub
 from requests import get as http_get
 from ruamel import yaml
 from shutil import rmtree
-from sqlalchemy import and_, cast, or_, String
+from sqlalchemy import and_, case, cast, delete, Float, func, insert, inspect, Integer
+from sqlalchemy import or_, select, String, update
 from sqlalchemy.exc import IntegrityError, OperationalError
-from sqlalchemy.orm import aliased
+from sqlalchemy.orm import aliased, RelationshipDirection
 from sqlalchemy.sql.expression import true
 from subprocess import Popen
 from tarfile import open as open_tar
 from threading import current_thread, Thread
+from time import monotonic
 from traceback import format_exc
 from uuid import uuid4
 from xlrd import open_workbook
@@ -34,6 +36,7 @@ from xlwt import Workbook
 from eNMS.database import db
 from eNMS.forms import form_factory
 from eNMS.environment import env
+from eNMS.topology import topology
 from eNMS.variables import vs
 
 
@@ -125,34 +128,23 @@ class Controller:
         return result
 
     def bulk_deletion(self, table, **kwargs):
-        instances = self.filtering(table, properties=["id"], **kwargs)
-        for instance in instances:
-            db.delete(table, id=instance.id)
-        return len(instances)
+        instances = self.filtering(table, properties=["id"], rbac="edit", **kwargs)
+        ids, user = [instance.id for instance in instances], current_user.name
+        return self.start_job("Bulk Deletion", self.delete_instances, table, ids, user)
 
     def bulk_edit(self, table, **kwargs):
-        instances = kwargs.pop("id").split("-")
-        for instance_id in instances:
-            instance = db.factory(table, id=instance_id)
-            for property, value in kwargs.items():
-                if not kwargs.get(f"bulk-edit-{property}"):
-                    continue
-                edit_mode = kwargs.get(f"{property}-edit-mode")
-                if not edit_mode:
-                    setattr(instance, property, value)
-                else:
-                    current_value = getattr(instance, property)
-                    related_model = vs.relationships[table][property]["model"]
-                    objects = db.objectify(related_model, value)
-                    if edit_mode == "set":
-                        setattr(instance, property, objects)
-                    else:
-                        for obj in objects:
-                            if edit_mode == "append" and obj not in current_value:
-                                current_value.append(obj)
-                            elif edit_mode == "remove" and obj in current_value:
-                                current_value.remove(obj)
-        return len(instances)
+        editable_ids = self.filter_ids(table, kwargs.pop("id").split("-"), "edit")
+        properties = {}
+        for property, value in kwargs.items():
+            if not kwargs.get(f"bulk-edit-{property}"):
+                continue
+            edit_mode = kwargs.get(f"{property}-edit-mode")
+            if edit_mode:
+                related_model = vs.relationships[table][property]["model"]
+                value = self.filter_ids(related_model, value)
+            properties[property] = (value, edit_mode)
+        job_arguments = (table, editable_ids, properties, current_user.name)
+        return self.start_job("Bulk Edit", self.edit_instances, *job_arguments)
 
     def bulk_removal(
         self,
@@ -170,6 +162,15 @@ class Controller:
             getattr(target, target_property).remove(instance)
         return len(instances)
 
+    def bulk_upsert(self, model, instances):
+        result, chunk_size = defaultdict(list), db.transactions["upsert"]["chunk_size"]
+        for index in range(0, len(instances), chunk_size):
+            self.upsert_chunk(model, instances[index : index + chunk_size], result)
+            db.session.commit()
+        if getattr(vs.models[model], "class_type", None) in ("device", "link"):
+            topology.reset()
+        return result
+
     def calendar_init(self, type):
         results, properties = {}, ["id", "name", "runtime", "service_properties"]
         for instance in db.fetch_all(type):
@@ -293,6 +294,69 @@ class Controller:
         except Exception as exc:
             return {"alert": f"Unable to delete {model} ({exc})"}
 
+    def delete_instances(self, job_id, model, ids, user):
+        table, settings, names = vs.models[model], db.transactions["bulk"], []
+        set_based = getattr(table, "class_type", None) in settings["models"]
+        chunk_size = settings["chunk_size"]
+        for index in range(0, len(ids), chunk_size):
+            chunk = ids[index : index + chunk_size]
+            if set_based:
+                query = db.session.query(table.name).filter(table.id.in_(chunk))
+                names.extend(name for name, in query)
+                self.delete_rows(inspect(table), chunk)
+            else:
+                query = db.query(model, rbac=None).filter(table.id.in_(chunk))
+                for instance in query.all():
+                    db.delete_instance(instance)
+            db.session.commit()
+            self.update_job(job_id, progress=min(index + chunk_size, len(ids)))
+        if set_based:
+            self.update_pool_counters()
+            log = f"BULK DELETION: {len(names)} {model}s"
+            env.log("info", log, user=user, diff={"deleted": names})
+            topology.reset()
+        return len(ids)
+
+    def delete_rows(self, mapper, ids):
+        mapped_tables = {mapped.local_table for mapped in db.base.registry.mappers}
+        tables, ancestor = [], mapper.inherits
+        for descendant in reversed(list(mapper.self_and_descendants)):
+            tables.append(descendant.local_table)
+        while ancestor:
+            tables.append(ancestor.local_table)
+            ancestor = ancestor.inherits
+        relationships = {
+            relationship
+            for descendant in mapper.self_and_descendants
+            for relationship in descendant.relationships
+            if relationship.direction is RelationshipDirection.ONETOMANY
+            and not relationship.viewonly
+        }
+        for relationship in relationships:
+            column = relationship.synchronize_pairs[0][1]
+            if relationship.cascade.delete:
+                target = relationship.mapper
+                query = select(column.table.c.id).where(column.in_(ids))
+                target_ids = [id for id, in db.session.execute(query)]
+                if target_ids:
+                    self.delete_rows(target, target_ids)
+            else:
+                db.session.execute(
+                    update(column.table)
+                    .where(column.in_(ids))
+                    .values({column.name: None})
+                )
+        for association in db.base.metadata.tables.values():
+            if association in mapped_tables:
+                continue
+            for foreign_key in association.foreign_keys:
+                if foreign_key.column.table in tables:
+                    db.session.execute(
+                        delete(association).where(foreign_key.parent.in_(ids))
+                    )
+        for table in dict.fromkeys(tables):
+            db.session.execute(delete(table).where(table.c.id.in_(ids)))
+
     def delete_builder_selection(self, type, id, **selection):
         instance = db.fetch(type, id=id)
         instance.update_last_modified_properties()
@@ -315,6 +379,92 @@ class Controller:
                     instance.services.remove(service)
         return instance.last_modified
 
+    def edit_instances(self, job_id, model, ids, properties, user):
+        table, mapper = vs.models[model], inspect(vs.models[model])
+        settings = db.transactions["bulk"]
+        set_based = getattr(table, "class_type", None) in settings["models"]
+        chunk_size = settings["chunk_size"]
+        values, relations = defaultdict(dict), {}
+        for property, (value, edit_mode) in properties.items():
+            relationship = mapper.relationships.get(property)
+            if property in mapper.columns and property not in vs.private_properties_set:
+                values[mapper.columns[property].table][property] = value
+            elif relationship is not None and relationship.secondary is not None:
+                relations[relationship] = ([int(id) for id in value], edit_mode)
+            else:
+                set_based = False
+        if "last_modified_by" in mapper.columns:
+            last_modified = {"last_modified": vs.get_time(), "last_modified_by": user}
+            values[mapper.columns["last_modified"].table].update(last_modified)
+        for index in range(0, len(ids), chunk_size):
+            chunk = ids[index : index + chunk_size]
+            if set_based:
+                for column_table, column_values in values.items():
+                    db.session.execute(
+                        update(column_table)
+                        .where(column_table.c.id.in_(chunk))
+                        .values(column_values)
+                    )
+                for relationship, (related_ids, edit_mode) in relations.items():
+                    self.edit_associations(relationship, chunk, related_ids, edit_mode)
+            else:
+                for instance_id in chunk:
+                    instance = db.factory(model, id=instance_id, rbac=None)
+                    if hasattr(instance, "last_modified_by"):
+                        instance.last_modified_by = user
+                    for property, (value, edit_mode) in properties.items():
+                        if not edit_mode:
+                            setattr(instance, property, value)
+                            continue
+                        current_value = getattr(instance, property)
+                        related_model = vs.relationships[model][property]["model"]
+                        objects = db.objectify(related_model, value, rbac=None)
+                        if edit_mode == "set":
+                            setattr(instance, property, objects)
+                        else:
+                            for obj in objects:
+                                if edit_mode == "append" and obj not in current_value:
+                                    current_value.append(obj)
+                                elif edit_mode == "remove" and obj in current_value:
+                                    current_value.remove(obj)
+            db.session.commit()
+            self.update_job(job_id, progress=min(index + chunk_size, len(ids)))
+        if set_based and relations:
+            self.update_pool_counters()
+        if set_based:
+            diff = {property: str(value) for property, (value, _) in properties.items()}
+            log = f"BULK EDIT: {len(ids)} {model}s ({', '.join(properties)})"
+            env.log("info", log, user=user, diff=diff)
+        return len(ids)
+
+    def edit_associations(self, relationship, ids, related_ids, edit_mode):
+        secondary = relationship.secondary
+        local = relationship.synchronize_pairs[0][1]
+        remote = relationship.secondary_synchronize_pairs[0][1]
+        if edit_mode in ("set", "remove", None):
+            constraints = [local.in_(ids)]
+            if edit_mode == "remove":
+                constraints.append(remote.in_(related_ids))
+            db.session.execute(delete(secondary).where(*constraints))
+        if edit_mode in ("set", "append", None) and related_ids:
+            existing_rows = set()
+            if edit_mode == "append":
+                existing_rows = set(
+                    db.session.execute(
+                        select(local, remote).where(
+                            local.in_(ids), remote.in_(related_ids)
+                        )
+                    )
+                )
+            rows = [
+                {local.name: id, remote.name: related_id}
+                for id in ids
+                for related_id in related_ids
+                if (id, related_id) not in existing_rows
+            ]
+            if rows:
+                db.session.execute(insert(secondary), rows)
+
     def edit_file(self, filepath):
         scoped_path = filepath.replace(">", "/")
         file = db.fetch("file", path=scoped_path)
@@ -430,6 +580,8 @@ class Controller:
         constraints.extend(table.filtering_constraints(**kwargs))
         query = self.filtering_relationship_constraints(query, model, **kwargs)
         query = query.filter(and_(*constraints))
+        if bulk == "query":
+            return query
         if bulk or properties:
             instances = query.all()
             if bulk == "object" or properties:
@@ -462,6 +614,15 @@ class Controller:
             table_result["full_result"] = ",".join(obj.name for obj in query.all())
         return table_result
 
+    def filter_ids(self, model, ids, rbac="read"):
+        ids, filtered_ids = [int(id) for id in ids], []
+        chunk_size = db.transactions["bulk"]["chunk_size"]
+        for index in range(0, len(ids), chunk_size):
+            query = db.query(model, rbac=rbac, properties=["id"])
+            constraint = vs.models[model].id.in_(ids[index : index + chunk_size])
+            filtered_ids.extend(instance.id for instance in query.filter(constraint))
+        return filtered_ids
+
     def get(self, model, id, **kwargs):
         if not kwargs:
             get_model = (
@@ -527,7 +688,7 @@ class Controller:
     def get_git_history(self, device_id):
         device = db.fetch("device", id=device_id, rbac="configuration")
         repo = Repo(vs.path / "network_data")
-        path = vs.path / "network_data" / device.name
+        path = vs.get_device_path(device.name)
         return {
             data_type: [
                 {"hash": str(commit), "date": commit.committed_datetime}
@@ -541,7 +702,8 @@ class Controller:
         device = db.fetch("device", name=device_name, rbac="configuration")
         for property in vs.configuration_properties:
             try:
-                file = commit.tree / device_name / property
+                device_path = vs.get_device_path(device_name, "")
+                file = commit.tree / str(device_path / property)
                 with BytesIO(file.data_stream.read()) as f:
                     value = f.read().decode("utf-8")
                 result[property] = vs.custom.parse_configuration_property(
@@ -551,6 +713,17 @@ class Controller:
                 result[property] = ""
         return {"result": result, "datetime": commit.committed_datetime}
 
+    def get_job(self, job_id):
+        job = self.read_job(job_id)
+        if job and (job["owner"] == current_user.name or current_user.is_admin):
+            return job
+
+    def read_job(self, job_id):
+        if env.redis_queue:
+            job = env.redis("get", f"jobs/{job_id}")
+            return loads(job) if job else None
+        return vs.jobs.get(job_id)
+
     def get_migration_folders(self):
         return listdir(Path(vs.migration_path))
 
@@ -570,37 +743,50 @@ class Controller:
         )
 
     def get_report_template(self, template):
-        return vs.reports[template]
+        path = vs.reports[template]
+        return path.read_text() if path else ""
 
     def get_result(self, id):
         return db.fetch("result", id=id).result
 
-    def get_runtimes(self, id, display=None):
+    def get_runtimes(self, id, display=None, search=None, page=0):
         service_alias = aliased(vs.models["service"])
         query = (
             db.query("run", properties=["runtime"])
             .join(service_alias, vs.models["run"].services)
             .filter(service_alias.id == id)
         )
+        query = self.filter_runtimes(query, display, search, page)
+        return [(run.runtime, run.runtime) for run in query.all()]
+
+    def filter_runtimes(self, query, display=None, search=None, page=0):
+        run_model = vs.models["run"]
+        page_size = vs.automation["workflow"]["runtimes_page_size"]
         if display == "user":
-            query = query.filter(vs.models["run"].creator == current_user.name)
-        return sorted(((run.runtime, run.runtime) for run in query.all()), reverse=True)
+            query = query.filter(run_model.creator == current_user.name)
+        if search:
+            query = query.filter(
+                or_(run_model.runtime.contains(search), run_model.name.contains(search))
+            )
+        query = query.order_by(run_model.runtime.desc())
+        return query.offset(int(page) * page_size).limit(page_size)
 
     def get_service_logs(self, service, runtime, line=0, device=None):
         log_instance = db.fetch(
             "service_log", allow_none=True, runtime=runtime, service_id=service
         )
+        device_name = db.fetch("device", id=device).name if device else None
         number_of_lines = 0
         if log_instance:
             lines = log_instance.content.splitlines()
+            if device:
+                lines = [line for line in lines if f"DEVICE {device_name}" in line]
         else:
-            lines = (
-                env.log_queue(runtime, service, start_line=int(line), mode="get") or []
+            lines = env.log_queue(
+                runtime, service, start_line=int(line), mode="get", device=device_name
             )
+            lines = lines or []
             number_of_lines = len(lines)
-        if device:
-            device_name = db.fetch("device", id=device).name
-            lines = [line for line in lines if f"DEVICE {device_name}" in line]
         return {
             "logs": "\n".join(lines),
             "refresh": not log_instance,
@@ -614,18 +800,19 @@ class Controller:
         service = db.fetch("service", id=path_id[-1], allow_none=True)
         if not service:
             raise db.rbac_error
-        runs = db.query("run", rbac=None).filter(
+        runtimes = db.query("run", properties=["runtime", "name"], rbac=None).filter(
             vs.models["run"].service_id.in_(path_id)
         )
-        if display == "user":
-            runs = runs.filter(vs.models["run"].creator == current_user.name)
-        runs = runs.all()
-        if runtime != "normal" and runs:
-            if runtime == "latest":
-                run = sorted(runs, key=attrgetter("runtime"), reverse=True)[0]
-            else:
-                run = db.fetch("run", allow_none=True, runtime=runtime)
-            state = run.get_state() if run else None
+        runtimes = self.filter_runtimes(runtimes, display, kwargs.get("search")).all()
+        if runtime == "latest":
+            latest_runtime = self.get_latest_runtime(path, display)
+            run = db.fetch("run", allow_none=True, runtime=latest_runtime, rbac=None)
+        elif runtime != "normal":
+            run = db.fetch("run", allow_none=True, runtime=runtime)
+        if run:
+            state = run.get_state()
+            if run.runtime not in {row.runtime for row in runtimes}:
+                runtimes.append((run.runtime, run.name))
         if kwargs.get("device") and run:
             output["device_state"] = {
                 result.service_id: result.success
@@ -645,9 +832,7 @@ class Controller:
                 serialized_service["services"].append(properties)
         return {
             "service": serialized_service,
-            "runtimes": sorted(
-                set((run.runtime, run.name) for run in runs), reverse=True
-            ),
+            "runtimes": [tuple(runtime) for runtime in runtimes],
             "state": state,
             "run": run.get_properties(include=run_properties) if run else None,
             **output,
@@ -669,6 +854,87 @@ class Controller:
             },
         }
 
+    def get_latest_runtime(self, path, display=None):
+        run_model = vs.models["run"]
+        query = db.query("run", properties=["runtime"], rbac=None).filter(
+            run_model.service_id.in_(path.split(">"))
+        )
+        if display == "user":
+            query = query.filter(run_model.creator == current_user.name)
+        latest_run = query.order_by(run_model.runtime.desc()).first()
+        return latest_run.runtime if latest_run else None
+
+    def get_last_modified(self, model, id):
+        query = db.session.query(vs.models[model].last_modified)
+        return query.filter_by(id=id).scalar()
+
+    @staticmethod
+    def format_event(event, data):
+        if not isinstance(data, str):
+            data = dumps(data, default=str)
+        return f"event: {event}\ndata: {data}\n\n"
+
+    def stream_network_state(self, path, runtime=None):
+        network_id = path.split(">")[-1]
+        state = self.get_network_state(path, runtime)
+        yield self.format_event("state", state)
+        last_modified = state["network"]["last_modified"]
+        db.session.rollback()
+        for event in env.subscribe_state(runtime):
+            if event:
+                yield self.format_event("delta", event)
+                continue
+            yield ": heartbeat\n\n"
+            modified = self.get_last_modified("network", network_id)
+            db.session.rollback()
+            if modified != last_modified:
+                last_modified = modified
+                network = db.fetch("network", id=network_id)
+                network_state = {"network": network.to_dict(include=["nodes", "links"])}
+                yield self.format_event("state", network_state)
+                db.session.rollback()
+
+    def stream_service_state(self, path, **kwargs):
+        service_id, display = path.split(">")[-1], kwargs.get("display")
+        while True:
+            state = self.get_service_state(path, **kwargs)
+            yield self.format_event("state", state)
+            last_modified = state["service"]["last_modified"]
+            runtime = state["run"]["runtime"] if state["run"] else None
+            db.session.rollback()
+            for event in env.subscribe_state(runtime):
+                if event:
+                    yield self.format_event("delta", event)
+                    continue
+                yield ": heartbeat\n\n"
+                modified = self.get_last_modified("service", service_id)
+                latest_runtime = runtime
+                if kwargs.get("runtime") == "latest":
+                    latest_runtime = self.get_latest_runtime(path, display)
+                db.session.rollback()
+                if modified != last_modified or latest_runtime != runtime:
+                    break
+
+    def stream_state(self, type, path, **kwargs):
+        if not vs.state_stream_slots.acquire(blocking=False):
+            yield self.format_event("fallback", {})
+            return
+        lifetime = monotonic() + vs.settings["automation"]["state_stream_lifetime"]
+        events = getattr(self, f"stream_{type}_state")(path, **kwargs)
+        try:
+            for event in events:
+                yield event
+                if monotonic() > lifetime:
+                    break
+        except Exception:
+            db.session.rollback()
+            log = f"State stream of '{path}' failed:\n{format_exc()}"
+            env.log("error", log, change_log=False)
+            yield self.format_event("fallback", {})
+        finally:
+            events.close()
+            vs.state_stream_slots.release()
+
     def get_top_level_instances(self, type):
         result = defaultdict(list)
         constraints = [~getattr(vs.models[type], f"{type}s").any()]
@@ -714,6 +980,30 @@ class Controller:
             db.session.commit()
         env.log("info", "Scan of Files Successful")
 
+    def get_upsert_columns(self, model):
+        table, columns = vs.models[model], {}
+        upsert_models = db.transactions["upsert"]["models"]
+        if getattr(table, "class_type", None) not in upsert_models:
+            return columns
+        mapper = inspect(table)
+        excluded = {"id", "owners", "restrict_to_owners", "type"}
+        for column in mapper.column_attrs:
+            if (
+                column.key in excluded
+                or column.key in vs.private_properties_set
+                or vs.model_properties[model].get(column.key) in ("dict", "list")
+            ):
+                continue
+            columns[column.key] = column.key
+        for property, relation in vs.relationships[model].items():
+            local_columns = mapper.relationships[property].local_columns
+            if relation["list"] or len(local_columns) != 1:
+                continue
+            column = next(iter(local_columns))
+            if column.foreign_keys:
+                columns[property] = mapper.get_property_by_column(column).key
+        return columns
+
     def get_visualization_pools(self, view):
         has_device = vs.models["pool"].devices.any()
         has_link = vs.models["pool"].links.any()
@@ -1249,6 +1539,17 @@ class Controller:
             **{f"target_{kwargs['type']}s": kwargs["targets"].split("-")},
         )
 
+    def run_job(self, job_id, function, *args):
+        try:
+            self.update_job(job_id, status="Completed", result=function(job_id, *args))
+        except Exception:
+            db.session.rollback()
+            error = format_exc()
+            env.log("error", f"Job {job_id} failed:\n{error}", change_log=False)
+            self.update_job(job_id, status="Failed", error=error)
+        finally:
+            db.session.remove()
+
     def save_file(self, filepath, **kwargs):
         scoped_path, content = filepath.replace(">", "/"), None
         if kwargs.get("file_content"):
@@ -1345,6 +1646,14 @@ class Controller:
             "update_time": workflow.last_modified,
         }
 
+    def start_job(self, name, function, model, ids, *args):
+        job_id, owner = str(uuid4()), current_user.name
+        state = {"name": name, "owner": owner, "progress": 0, "total": len(ids)}
+        self.update_job(job_id, status="Running", **state)
+        job_arguments = (job_id, function, model, ids, *args)
+        Thread(target=self.run_job, args=job_arguments).start()
+        return {"id": job_id, "total": len(ids)}
+
     def stop_run(self, runtime):
         run = db.fetch("run", allow_none=True, runtime=runtime)
         if run and run.status == "Running":
@@ -1448,7 +1757,15 @@ class Controller:
     def update_database_configurations_from_git(self, force_update=False):
         path = vs.path / "network_data"
         env.log("info", f"Updating device configurations with data from {path}")
-        for dir in scandir(path):
+        directories = scandir(path)
+        if vs.settings["app"]["git_shard_length"]:
+            directories = (
+                directory
+                for shard in scandir(path)
+                if shard.is_dir() and shard.name != ".git"
+                for directory in scandir(shard.path)
+            )
+        for dir in directories:
             device = db.fetch("device", allow_none=True, name=dir.name)
             timestamp_path = Path(dir.path) / "timestamps.json"
             if not device:
@@ -1499,14 +1816,242 @@ class Controller:
             return {"error": "The path resolves outside of the files folder."}
         kwargs["file"].save(path)
 
+    def update_job(self, job_id, **state):
+        job = {**(self.read_job(job_id) or {}), **state}
+        if env.redis_queue:
+            timeout = db.transactions["bulk"]["job_timeout"]
+            env.redis("set", f"jobs/{job_id}", dumps(job), ex=timeout)
+        else:
+            vs.jobs[job_id] = job
+
     def update_pool(self, pool_id):
         db.fetch("pool", id=int(pool_id), rbac="edit").compute_pool()
 
-    def view_filtering(self, **kwargs):
-        return {
-            f"{model}s": self.filtering(model, **form, bulk="view_properties")
-            for model, form in kwargs.items()
+    def update_pool_counters(self):
+        pool = vs.models["pool"]
+        for model in pool.models:
+            association = getattr(db, f"pool_{model}_table")
+            count = (
+                select(func.count())
+                .where(association.c.pool_id == pool.id)
+                .scalar_subquery()
+            )
+            db.session.execute(
+                update(pool)
+                .values({f"{model}_number": count})
+                .execution_options(synchronize_session=False)
+            )
+        db.session.commit()
+
+    def upsert_chunk(self, model, instances, result):
+        table, relations = vs.models[model], vs.relationships[model]
+        user, log_events = getattr(current_user, "name", "admin"), env.log_events
+        columns, rows = self.get_upsert_columns(model), []
+        related_names, updates = defaultdict(set), []
+        for instance in instances:
+            name = instance.get("name")
+            if not name:
+                result["failure"].append((instance, "Name is missing"))
+                continue
+            elif set("/\\'" + '"') & set(name + instance.get("new_name", "")):
+                error = "Names cannot contain a slash or a quote."
+                result["failure"].append((instance, error))
+                continue
+            rows.append(instance)
+            for property, relation in relations.items():
+                if not instance.get(property):
+                    continue
+                value = instance[property]
+                names = value if relation["list"] else [value]
+                related_names[relation["model"]].update(names)
+        related_ids = {
+            related_model: dict(
+                db.query(related_model, properties=["name", "id"]).filter(
+                    vs.models[related_model].name.in_(names)
+                )
+            )
+            for related_model, names in related_names.items()
         }
+        properties = set().union(*rows) & columns.keys()
+        existing = {
+            instance.name: instance
+            for instance in db.session.query(
+                table.id,
+                table.name,
+                *(getattr(table, columns[property]) for property in properties),
+            ).filter(table.name.in_([row["name"] for row in rows]))
+        }
+        editable = {
+            instance.id
+            for instance in db.query(model, rbac="edit", properties=["id"]).filter(
+                table.id.in_([instance.id for instance in existing.values()])
+            )
+        }
+        for row in rows:
+            kwargs, errors = dict(row), []
+            for property, relation in relations.items():
+                if not kwargs.get(property):
+                    continue
+                ids = related_ids[relation["model"]]
+                names = kwargs[property] if relation["list"] else [kwargs[property]]
+                errors.extend(
+                    f"No {relation['model']} with the name '{name}'"
+                    for name in names
+                    if name not in ids
+                )
+                resolved = [ids.get(name) for name in names]
+                kwargs[property] = resolved if relation["list"] else resolved[0]
+            instance = existing.get(row["name"])
+            if instance and instance.id not in editable:
+                errors.append(f"Not allowed to edit '{row['name']}'")
+            if errors:
+                result["failure"].append((row, errors))
+                continue
+            new_name = kwargs.pop("new_name", None)
+            bulk_update = instance and all(
+                property in columns or not hasattr(table, property)
+                for property in kwargs
+            )
+            if not bulk_update:
+                try:
+                    with db.session.begin_nested():
+                        if instance:
+                            kwargs["id"] = instance.id
+                        instance = db.factory(model, no_fetch=True, **kwargs)
+                        if new_name:
+                            instance.name = new_name
+                    result["success"].append(instance.name)
+                except Exception:
+                    result["failure"].append((row, format_exc()))
+                continue
+            parameters, changes = {"id": instance.id}, {}
+            for property in properties & kwargs.keys():
+                key, value = columns[property], kwargs[property]
+                if vs.model_properties[model].get(property) == "bool":
+                    value = value not in (False, "false")
+                if getattr(instance, key) == value:
+                    continue
+                parameters[key] = value
+                if getattr(table, key).info.get("log_change", True):
+                    old_value = str(getattr(instance, key))
+                    changes[key] = {"old": old_value, "new": str(value)}
+            if new_name:
+                parameters["name"] = new_name
+                changes["name"] = {"old": instance.name, "new": new_name}
+            if len(parameters) > 1 and hasattr(table, "last_modified_by"):
+                parameters.update(last_modified=vs.get_time(), last_modified_by=user)
+            if len(parameters) == 1:
+                result["success"].append(row["name"])
+            else:
+                updates.append((row, parameters, changes))
+        try:
+            if updates:
+                with db.session.begin_nested():
+                    db.session.execute(update(table), [row[1] for row in updates])
+        except Exception:
+            for index, (row, parameters, _) in enumerate(updates):
+                try:
+                    with db.session.begin_nested():
+                        db.session.execute(update(table), [parameters])
+                except Exception:
+                    result["failure"].append((row, format_exc()))
+                    updates[index] = None
+        for row, parameters, diff in filter(None, updates):
+            result["success"].append(row["name"])
+            if not diff or not log_events or not getattr(table, "log_change", True):
+                continue
+            changes = " | ".join(
+                f"{key}: '{change['old']}' => '{change['new']}'"
+                for key, change in diff.items()
+            )
+            log = f"UPDATE: {model} '{row['name']}': ({changes})"
+            env.log("info", log, user=user, diff=diff, session=db.session)
+
+    def view_filtering(self, bounds=None, zoom=None, **kwargs):
+        kwargs = {"device": {}, "link": {}, **kwargs}
+        if bounds:
+            sides = itemgetter("south", "west", "north", "east")(bounds)
+            key = (current_user.name, dumps(kwargs, sort_keys=True), *sides, zoom)
+            return vs.get_view(key, lambda: self.spatial_view(bounds, zoom, **kwargs))
+        devices = self.filtering("device", **kwargs["device"], bulk="view_properties")
+        links = self.filtering("link", **kwargs["link"], bulk="query")
+        return {"devices": devices, "links": self.link_view_properties(links)}
+
+    @staticmethod
+    def coordinates(model):
+        pattern = r"^\s*[-+]?([0-9]+\.?[0-9]*|\.[0-9]+)\s*$"
+        return tuple(
+            case((column.regexp_match(pattern), cast(column, Float)), else_=None)
+            for column in (model.latitude, model.longitude)
+        )
+
+    def in_bounds(self, model, bounds):
+        latitude, longitude = self.coordinates(model)
+        return and_(
+            latitude.between(bounds["south"], bounds["north"]),
+            longitude.between(bounds["west"], bounds["east"]),
+        )
+
+    def link_view_properties(self, query, bounds=None):
+        link = vs.models["link"]
+        source = aliased(vs.models["device"])
+        destination = aliased(vs.models["device"])
+        query = query.join(source, link.source_id == source.id).join(
+            destination, link.destination_id == destination.id
+        )
+        if bounds:
+            query = query.filter(
+                or_(
+                    self.in_bounds(source, bounds),
+                    self.in_bounds(destination, bounds),
+                )
+            )
+        properties = ("id", "type", "name", "color")
+        columns = {property: getattr(link, property) for property in properties}
+        for prefix, endpoint in (("source", source), ("destination", destination)):
+            for property in ("id", "longitude", "latitude"):
+                columns[f"{prefix}_{property}"] = getattr(endpoint, property)
+        rows = query.with_entities(*columns.values()).all()
+        return [dict(zip(columns, row)) for row in rows]
+
+    def spatial_view(self, bounds, zoom, **kwargs):
+        settings = vs.visualization["geographical"]["clustering"]
+        device = vs.models["device"]
+        properties = ("id", "type", "name", "icon", "latitude", "longitude")
+        columns = [getattr(device, property) for property in properties]
+        devices = self.filtering("device", **kwargs["device"], bulk="query")
+        devices = devices.filter(self.in_bounds(device, bounds))
+        view = {"clusters": [], "devices": [], "links": []}
+        if zoom < settings["max_zoom"] and devices.count() > settings["max_markers"]:
+            cell = settings["cell_size"] * 360 / (256 * 2 ** int(zoom))
+            latitude, longitude = self.coordinates(device)
+            clusters = (
+                devices.with_entities(
+                    func.count(device.id),
+                    func.avg(latitude),
+                    func.avg(longitude),
+                    func.min(device.id),
+                )
+                .group_by(
+                    cast((latitude + 90) / cell, Integer),
+                    cast((longitude + 180) / cell, Integer),
+                )
+                .all()
+            )
+            single_devices = []
+            for count, latitude, longitude, device_id in clusters:
+                if count == 1:
+                    single_devices.append(device_id)
+                else:
+                    cluster = {"count": count, "latitude": latitude}
+                    view["clusters"].append({**cluster, "longitude": longitude})
+            devices = devices.filter(device.id.in_(single_devices))
+        else:
+            links = self.filtering("link", **kwargs["link"], bulk="query")
+            view["links"] = self.link_view_properties(links, bounds)
+        rows = devices.with_entities(*columns).all()
+        view["devices"] = [dict(zip(properties, row)) for row in rows]
+        return view
 
     def web_connection(self, device_id, **kwargs):
         if not vs.settings["ssh"]["credentials"][kwargs["credentials"]]:
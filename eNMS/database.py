@@ -1,5 +1,6 @@
 from ast import literal_eval
 from atexit import register
+from collections import Counter
 from contextlib import contextmanager
 from flask_login import current_user
 from importlib.util import module_from_spec, spec_from_file_location
@@ -9,6 +10,7 @@ from operator import attrgetter
 from os import getenv, getpid
 from os.path import exists
 from pathlib import Path
+from queue import Empty
 from sqlalchemy import (
     Boolean,
     Column,
@@ -32,11 +34,13 @@ from sqlalchemy.orm import (
     configure_mappers,
     relationship,
     scoped_session,
+    Session,
     sessionmaker,
 )
 from sqlalchemy.orm.collections import InstrumentedList
 from sqlalchemy.types import JSON
-from time import sleep
+from threading import Lock
+from time import monotonic, sleep
 from traceback import format_exc
 from uuid import getnode
 
@@ -74,15 +78,18 @@ class Database:
         for retry_type, values in self.transactions["retry"].items():
             for parameter, number in values.items():
                 setattr(self, f"retry_{retry_type}_{parameter}", number)
+        self.transaction_metrics = Counter()
+        self.transaction_metrics_lock = Lock()
+        self.changelog_properties = {}
         register(self.cleanup)
 
     def _initialize(self, env):
-        self.register_custom_models()
-        try:
-            self.base.metadata.create_all(bind=self.engine)
-        except OperationalError:
-            info(f"Bypassing metadata creation for process {getpid()}")
-        configure_mappers()
+        with vs.profile_startup("models"):
+            self.register_custom_models()
+        with vs.profile_startup("tables"):
+            self.create_tables()
+        with vs.profile_startup("mappers"):
+            configure_mappers()
         self.configure_model_events(env)
         if env.detect_cli():
             return
@@ -228,62 +235,97 @@ class Database:
                     "list": relation.uselist,
                 }
 
+    def get_changelog_properties(self, model):
+        if model not in self.changelog_properties:
+            self.changelog_properties[model] = [
+                attribute.key
+                for attribute in inspect(model).attrs
+                if getattr(model, attribute.key).info.get("log_change", True)
+                and attribute.key not in vs.private_properties_set
+            ]
+        return self.changelog_properties[model]
+
+    def record_changelog(self, session, entry):
+        transaction = session.get_nested_transaction() or session.get_transaction()
+        changelog = session.info.setdefault("changelog", {})
+        changelog.setdefault(transaction, []).append(entry)
+
     def configure_model_events(self, env):
         env.log_events = True
 
+        @event.listens_for(Session, "after_commit")
+        def write_changelog(session):
+            changelog = session.info.get("changelog", {})
+            savepoint = session.get_nested_transaction()
+            if savepoint:
+                entries = changelog.pop(savepoint, [])
+                changelog.setdefault(savepoint.parent, []).extend(entries)
+            else:
+                for entry in changelog.pop(session.get_transaction(), []):
+                    env.queue_changelog(entry)
+
+        @event.listens_for(Session, "after_transaction_end")
+        def discard_changelog(session, transaction):
+            session.info.get("changelog", {}).pop(transaction, None)
+
         @event.listens_for(self.base, "after_insert", propagate=True)
         def log_instance_creation(mapper, connection, target):
             if not getattr(target, "log_change", True) or not env.log_events:
                 return
             if hasattr(target, "name") and target.type != "run":
-                env.log("info", f"CREATION: {target.type} '{target.name}'")
+                log = f"CREATION: {target.type} '{target.name}'"
+                env.log("info", log, session=inspect(target).session)
 
         @event.listens_for(self.base, "before_delete", propagate=True)
         def log_instance_deletion(mapper, connection, target):
             if not getattr(target, "log_change", True) or not env.log_events:
                 return
             name = getattr(target, "name", str(target))
-            env.log("info", f"DELETION: {target.type} '{name}'")
+            log = f"DELETION: {target.type} '{name}'"
+            env.log("info", log, session=inspect(target).session)
 
         @event.listens_for(self.base, "before_update", propagate=True)
         def log_instance_update(mapper, connection, target):
-            if not env.log_events:
+            if (
+                not env.log_events
+                or getattr(target, "private", False)
+                or not getattr(target, "log_change", True)
+            ):
                 return
-            state, changelog = inspect(target), []
-            for attr in state.attrs:
-                hist = state.get_history(attr.key, True)
-                if (
-                    getattr(target, "private", False)
-                    or not getattr(target, "log_change", True)
-                    or not getattr(state.class_, attr.key).info.get("log_change", True)
-                    or attr.key in vs.private_properties_set
-                    or not hist.has_changes()
-                ):
+            state, changelog, diff = inspect(target), [], {}
+            for property in self.get_changelog_properties(state.class_):
+                history = state.attrs[property].history
+                if not history.has_changes():
                     continue
-                change = f"{attr.key}: "
-                property_type = type(getattr(target, attr.key))
+                change = f"{property}: "
+                property_type = type(getattr(target, property))
                 if property_type in (InstrumentedList, MutableList):
                     if property_type == MutableList:
-                        added = [x for x in hist.added[0] if x not in hist.deleted[0]]
-                        deleted = [x for x in hist.deleted[0] if x not in hist.added[0]]
+                        old = history.deleted[0] if history.deleted else []
+                        new = history.added[0] if history.added else []
+                        added = [str(x) for x in new if x not in old]
+                        deleted = [str(x) for x in old if x not in new]
                     else:
-                        added, deleted = hist.added, hist.deleted
+                        added = [str(x) for x in history.added]
+                        deleted = [str(x) for x in history.deleted]
                     if deleted:
                         change += f"DELETED: {deleted}"
                     if added:
                         change += f"{' / ' if deleted else ''}ADDED: {added}"
+                    diff[property] = {"added": added, "deleted": deleted}
                 else:
-                    change += (
-                        f"'{hist.deleted[0] if hist.deleted else None}' => "
-                        f"'{hist.added[0] if hist.added else None}'"
-                    )
+                    old = str(history.deleted[0]) if history.deleted else "None"
+                    new = str(history.added[0]) if history.added else "None"
+                    change += f"'{old}' => '{new}'"
+                    diff[property] = {"old": old, "new": new}
                 changelog.append(change)
             if changelog:
                 name, changes = (
                     getattr(target, "name", target.id),
                     " | ".join(changelog),
                 )
-                env.log("info", f"UPDATE: {target.type} '{name}': ({changes})")
+                log = f"UPDATE: {target.type} '{name}': ({changes})"
+                env.log("info", log, diff=diff, session=state.session)
 
         for model in vs.models.values():
             if "configure_events" in vars(model):
@@ -330,6 +372,7 @@ class Database:
                         ForeignKey(
                             f"{model2['foreign_key']}.id", **model2.get("kwargs", {})
                         ),
+                        index=model2.get("index", False),
                         primary_key=True,
                     ),
                 ),
@@ -439,11 +482,12 @@ class Database:
             except Exception as exc:
                 self.session.rollback()
                 if index == self.retry_fetch_number - 1:
+                    self.increment_metric("fetch_failures")
                     error(f"Fetch n°{index} failed ({format_exc()})")
                     raise exc
                 else:
                     warning(f"Fetch n°{index} failed ({str(exc)})")
-                sleep(self.retry_fetch_time * (index + 1))
+                self.backoff("fetch", index)
         if result or allow_none:
             return result
         else:
@@ -516,13 +560,81 @@ class Database:
                 except Exception as exc:
                     self.session.rollback()
                     if index == self.retry_commit_number - 1:
+                        self.increment_metric("commit_failures")
                         error(f"Commit n°{index} failed ({format_exc()})")
                         raise exc
                     else:
                         warning(f"Commit n°{index} failed ({str(exc)})")
-                    sleep(self.retry_commit_time * (index + 1))
+                    self.backoff("commit", index)
         return instance
 
+    def increment_metric(self, metric, value=1):
+        with self.transaction_metrics_lock:
+            self.transaction_metrics[metric] += value
+
+    def backoff(self, retry_type, index):
+        backoff_time = getattr(self, f"retry_{retry_type}_time") * (index + 1)
+        self.increment_metric(f"{retry_type}_retries")
+        self.increment_metric(f"{retry_type}_backoff_time", backoff_time)
+        sleep(backoff_time)
+
+    def commit_batch(self, batch):
+        for index in range(self.retry_commit_number):
+            try:
+                for model, kwargs in batch:
+                    self.factory(model, no_fetch=True, rbac=None, **kwargs)
+                self.session.commit()
+                self.increment_metric("batch_commits")
+                self.increment_metric("batch_instances", len(batch))
+                return
+            except Exception as exc:
+                self.session.rollback()
+                if index == self.retry_commit_number - 1:
+                    self.increment_metric("commit_failures")
+                    error(f"Batch commit n°{index} failed ({format_exc()})")
+                else:
+                    warning(f"Batch commit n°{index} failed ({str(exc)})")
+                    self.backoff("commit", index)
+        for model, kwargs in batch:
+            try:
+                self.factory(model, no_fetch=True, rbac=None, **kwargs)
+                self.session.commit()
+            except Exception:
+                self.session.rollback()
+                self.increment_metric("lost_instances")
+                properties = ("parent_runtime", "service_id", "device_id")
+                instance = {property: kwargs.get(property) for property in properties}
+                error(f"Could not save {model} {instance} ({format_exc()})")
+
+    def process_write_queue(self, queue):
+        batch_size = self.transactions["batch"]["size"]
+        batch_timeout = self.transactions["batch"]["timeout"]
+        batch, last_commit, queue_closed = [], monotonic(), False
+        try:
+            while not queue_closed:
+                try:
+                    item = queue.get(timeout=batch_timeout)
+                    if item is None:
+                        queue_closed = True
+                    else:
+                        batch.append(item)
+                except Empty:
+                    pass
+                timed_out = monotonic() - last_commit >= batch_timeout
+                if batch and (queue_closed or timed_out or len(batch) >= batch_size):
+                    self.commit_batch(batch)
+                    batch, last_commit = [], monotonic()
+        finally:
+            self.session.remove()
+
+    def get_transaction_metrics(self):
+        with self.transaction_metrics_lock:
+            metrics = dict(self.transaction_metrics)
+        return {
+            **metrics,
+            "pool_status": self.engine.pool.status(),
+        }
+
     def get_credential(
         self, username, name=None, device=None, credential_type="any", optional=False
     ):
@@ -562,10 +674,24 @@ class Database:
                     info(f"Loading {model}: {file}")
                     spec = spec_from_file_location(file.stem, str(file))
                     try:
-                        spec.loader.exec_module(module_from_spec(spec))
+                        with vs.profile_startup(f"{model} {file.name}"):
+                            spec.loader.exec_module(module_from_spec(spec))
                     except InvalidRequestError:
                         error(f"Error loading {model} '{file}'\n{format_exc()}")
 
+    def create_tables(self):
+        try:
+            existing_tables = set(inspect(self.engine).get_table_names())
+            tables = [
+                table
+                for table in self.base.metadata.sorted_tables
+                if table.name not in existing_tables
+            ]
+            if tables:
+                self.base.metadata.create_all(bind=self.engine, tables=tables)
+        except OperationalError:
+            info(f"Bypassing metadata creation for process {getpid()}")
+
     @contextmanager
     def session_scope(self):
         try:
@@ -1,20 +1,23 @@
-from base64 import b64decode, b64encode
+from atexit import register
+from base64 import b64decode, b64encode, encodebytes
 from click import get_current_context
 from collections import defaultdict
 from cryptography.fernet import Fernet
 from dramatiq.brokers.redis import RedisBroker
 from dramatiq import set_broker
 from email.mime.application import MIMEApplication
+from email.mime.base import MIMEBase
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.utils import formatdate
 from flask_login import current_user
 from importlib import import_module
-from json import load
+from json import dumps, load
 from logging.config import dictConfig
 from logging import getLogger, info
-from os import getenv, getpid
+from os import getenv, getpid, remove
 from passlib.hash import argon2
+from queue import Empty, Queue
 from pathlib import Path
 from psutil import Process
 from redis import Redis
@@ -22,12 +25,16 @@ from redis.exceptions import ConnectionError, TimeoutError
 from requests import Session as RequestSession
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
-from smtplib import SMTP
+from smtplib import quotedata, SMTP, SMTPDataError, SMTPRecipientsRefused
+from smtplib import SMTPSenderRefused
+from sqlalchemy import insert
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm.exc import StaleDataError
 from sys import path as sys_path
-from threading import Thread
+from threading import Lock, Thread, Timer
+from time import monotonic, sleep
 from traceback import format_exc
+from uuid import uuid4
 from warnings import warn
 from watchdog.observers.polling import PollingObserver
 from watchdog.events import FileSystemEventHandler
@@ -61,10 +68,13 @@ class Environment:
         if vs.settings["paths"]["custom_code"]:
             sys_path.append(vs.settings["paths"]["custom_code"])
         self.init_logs()
+        self.init_changelog_writer()
         self.init_redis()
         if vs.settings["automation"]["use_task_queue"]:
             self.init_dramatiq()
         self.init_connection_pools()
+        self.init_notification_dispatcher()
+        self.state_subscribers = defaultdict(set)
         Path(vs.settings["files"]["trash"]).mkdir(parents=True, exist_ok=True)
         main_thread = Thread(target=self.monitor_filesystem)
         main_thread.daemon = True
@@ -180,6 +190,58 @@ class Environment:
         except NameError as exc:
             warn(f"Module missing ({exc})")
 
+    def init_changelog_writer(self):
+        self.changelog_lock, self.changelog_pid = Lock(), None
+        register(self.flush_changelogs)
+
+    def queue_changelog(self, entry):
+        if self.changelog_pid != getpid():
+            with self.changelog_lock:
+                if self.changelog_pid != getpid():
+                    queue_size = db.transactions["changelog"]["queue_size"]
+                    self.changelog_queue = Queue(maxsize=queue_size)
+                    writer = Thread(target=self.write_changelogs)
+                    writer.daemon = True
+                    writer.start()
+                    self.changelog_pid = getpid()
+        self.changelog_queue.put(entry)
+
+    def write_changelogs(self):
+        settings, queue = db.transactions["changelog"], self.changelog_queue
+        while True:
+            batch = [queue.get()]
+            deadline = monotonic() + settings["timeout"]
+            while len(batch) < settings["batch_size"]:
+                try:
+                    batch.append(queue.get(timeout=max(deadline - monotonic(), 0)))
+                except Empty:
+                    break
+            try:
+                self.insert_changelogs(batch)
+            except Exception:
+                log = f"Changelog batch write failed, retrying per row ({format_exc()})"
+                self.log("warning", log, change_log=False)
+                for entry in batch:
+                    try:
+                        self.insert_changelogs([entry])
+                    except Exception:
+                        log = f"Changelog entry lost: {entry} ({format_exc()})"
+                        self.log("error", log, change_log=False)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    def insert_changelogs(self, entries):
+        with db.engine.begin() as connection:
+            connection.execute(insert(vs.models["changelog"].__table__), entries)
+
+    def flush_changelogs(self):
+        if self.changelog_pid != getpid():
+            return
+        deadline = monotonic() + db.transactions["changelog"]["timeout"] * 10
+        while self.changelog_queue.unfinished_tasks and monotonic() < deadline:
+            sleep(0.1)
+
     def init_connection_pools(self):
         self.request_session = RequestSession()
         retry = Retry(**vs.settings["requests"]["retries"])
@@ -189,6 +251,103 @@ class Environment:
                 HTTPAdapter(max_retries=retry, **vs.settings["requests"]["pool"]),
             )
 
+    def init_notification_dispatcher(self):
+        self.notification_lock, self.notification_pid = Lock(), None
+        self.notification_queue, self.notification_retries = Queue(), {}
+        register(self.flush_notifications)
+
+    def queue_notification(self, name, function, cleanup=None, **kwargs):
+        if self.notification_pid != getpid():
+            with self.notification_lock:
+                if self.notification_pid != getpid():
+                    self.notification_queue = Queue()
+                    dispatcher = Thread(target=self.dispatch_notifications)
+                    dispatcher.daemon = True
+                    dispatcher.start()
+                    self.notification_pid = getpid()
+        self.notification_queue.put((name, function, kwargs, cleanup, 0))
+
+    def dispatch_notifications(self):
+        queue = self.notification_queue
+        while True:
+            notification = queue.get()
+            try:
+                self.send_notification(*notification)
+            finally:
+                queue.task_done()
+
+    def send_notification(self, name, function, kwargs, cleanup, attempt):
+        settings = vs.settings["notifications"]
+        try:
+            function(**kwargs)
+            self.log("info", f"{name} sent", change_log=False)
+        except Exception as exc:
+            if attempt < settings["retries"]:
+                delay = settings["backoff_factor"] * 2**attempt
+                delay = min(delay, settings["max_backoff"])
+                log = f"{name} failed ({exc}), retrying in {delay}s"
+                self.log("warning", log, change_log=False)
+                notification = (name, function, kwargs, cleanup, attempt + 1)
+                retry = Timer(delay, self.retry_notification, (notification,))
+                retry.daemon = True
+                self.notification_retries[id(notification)] = (retry, notification)
+                retry.start()
+                return
+            log = f"{name} failed after {attempt + 1} attempts ({exc})"
+            self.log("error", log, change_log=False)
+        if cleanup:
+            remove(cleanup)
+
+    def retry_notification(self, notification):
+        if self.notification_retries.pop(id(notification), None):
+            self.notification_queue.put(notification)
+
+    def flush_notifications(self):
+        if self.notification_pid != getpid():
+            return
+        for retry, notification in list(self.notification_retries.values()):
+            retry.cancel()
+            self.retry_notification(notification)
+        deadline = monotonic() + vs.settings["notifications"]["shutdown_timeout"]
+        while self.notification_queue.unfinished_tasks and monotonic() < deadline:
+            sleep(0.1)
+
+    def send_mattermost(self, **kwargs):
+        self.request_session.post(**kwargs).raise_for_status()
+
+    def publish_state(self, runtime, event):
+        if self.redis_queue:
+            self.redis("publish", f"{runtime}/events", dumps(event, default=str))
+        elif self.state_subscribers.get(runtime):
+            event = dumps(event, default=str)
+            for subscriber in list(self.state_subscribers[runtime]):
+                subscriber.put(event)
+
+    def subscribe_state(self, runtime):
+        timeout = vs.settings["automation"]["state_stream_heartbeat"]
+        if self.redis_queue:
+            pubsub = self.redis_queue.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(f"{runtime}/events")
+            try:
+                while True:
+                    message = pubsub.get_message(timeout=timeout)
+                    yield message["data"] if message else None
+            finally:
+                pubsub.close()
+        else:
+            subscriber = Queue()
+            self.state_subscribers[runtime].add(subscriber)
+            try:
+                while True:
+                    try:
+                        yield subscriber.get(timeout=timeout)
+                    except Empty:
+                        yield None
+            finally:
+                self.state_subscribers[runtime].discard(subscriber)
+                if not self.state_subscribers[runtime]:
+                    self.state_subscribers.pop(runtime, None)
+
     def init_dramatiq(self):
         set_broker(
             RedisBroker(
@@ -239,34 +398,56 @@ class Environment:
     def get_workers(self):
         return {worker.name: worker.to_dict() for worker in db.fetch_all("worker")}
 
-    def log(self, severity, content, user=None, change_log=True, logger="root"):
+    def log(
+        self,
+        severity,
+        content,
+        user=None,
+        change_log=True,
+        logger="root",
+        diff=None,
+        session=None,
+    ):
         logger_settings = vs.logging["loggers"].get(logger, {})
         if logger:
             getattr(getLogger(logger), severity)(content)
         if change_log or logger and logger_settings.get("change_log"):
-            db.factory(
-                "changelog",
-                **{
-                    "severity": severity,
-                    "content": content,
-                    "user": user or getattr(current_user, "name", ""),
-                },
-            )
+            entry = {
+                "content": content,
+                "diff": diff or {},
+                "severity": severity,
+                "time": vs.get_time(),
+                "type": "changelog",
+                "user": user or getattr(current_user, "name", ""),
+            }
+            if session and session.in_transaction():
+                db.record_changelog(session, entry)
+            else:
+                self.queue_changelog(entry)
         return logger_settings
 
-    def log_queue(self, runtime, service, log=None, mode="add", start_line=0):
+    def log_queue(
+        self, runtime, service, log=None, mode="add", start_line=0, device=None
+    ):
         if self.redis_queue:
             key = f"{runtime}/{service}/logs"
             vs.run_logs[runtime][int(service)] = None
             if mode == "add":
-                log = self.redis("lpush", key, log)
+                if device:
+                    self.redis("rpush", f"{key}/{device}", log)
+                log = self.redis("rpush", key, log)
             else:
-                log = self.redis("lrange", key, 0, -1)
-                if log:
-                    log = log[::-1][start_line:]
+                if device:
+                    key = f"{key}/{device}"
+                log = self.redis("lrange", key, start_line, -1)
         else:
+            device_logs = vs.run_device_logs[runtime]
             if mode == "add":
+                if device:
+                    device_logs[(int(service), device)].append(log)
                 return vs.run_logs[runtime][int(service)].append(log)
+            elif device:
+                log = device_logs.get((int(service), device), [])[start_line:]
             else:
                 full_log = getattr(vs.run_logs[runtime], mode)(int(service), [])
                 log = full_log[start_line:]
@@ -287,6 +468,7 @@ class Environment:
         sender=None,
         filename=None,
         file_content=None,
+        file_path=None,
         content_type="plain",
     ):
         sender = sender or vs.settings["mail"]["sender"]
@@ -297,8 +479,15 @@ class Environment:
         message["Subject"] = subject
         message.add_header("reply-to", reply_to or vs.settings["mail"]["reply_to"])
         message.attach(MIMEText(content, content_type))
-        if filename:
+        marker = None
+        if filename and file_path:
+            marker = str(uuid4())
+            attached_file = MIMEBase("application", "octet-stream", Name=filename)
+            attached_file["Content-Transfer-Encoding"] = "base64"
+            attached_file.set_payload(marker)
+        elif filename:
             attached_file = MIMEApplication(file_content, Name=filename)
+        if filename:
             attached_file["Content-Disposition"] = f'attachment; filename="{filename}"'
             message.attach(attached_file)
         smtp_args = (vs.settings["mail"]["server"], vs.settings["mail"]["port"])
@@ -307,7 +496,39 @@ class Environment:
                 server.starttls()
                 password = getenv("MAIL_PASSWORD", "")
                 server.login(vs.settings["mail"]["username"], password)
-            server.sendmail(sender, recipients.split(","), message.as_string())
+            if marker:
+                email = (sender, recipients.split(","), message, marker, file_path)
+                self.stream_email(server, *email)
+            else:
+                server.sendmail(sender, recipients.split(","), message.as_string())
+
+    def stream_email(self, server, sender, recipients, message, marker, file_path):
+        header, footer = message.as_string().split(marker)
+        server.ehlo_or_helo_if_needed()
+        code, reply = server.mail(sender)
+        if code != 250:
+            raise SMTPSenderRefused(code, reply, sender)
+        for recipient in recipients:
+            code, reply = server.rcpt(recipient)
+            if code not in (250, 251):
+                raise SMTPRecipientsRefused({recipient: (code, reply)})
+        code, reply = server.docmd("data")
+        if code != 354:
+            raise SMTPDataError(code, reply)
+        server.send(quotedata(header))
+        with open(file_path, "rb") as file:
+            while True:
+                chunk = file.read(57 * 1024)
+                if not chunk:
+                    break
+                server.send(encodebytes(chunk).replace(b"\n", b"\r\n"))
+        footer = quotedata(footer)
+        if not footer.endswith("\r\n"):
+            footer += "\r\n"
+        server.send(f"{footer}.\r\n")
+        code, reply = server.getreply()
+        if code != 250:
+            raise SMTPDataError(code, reply)
 
 
 env = Environment()
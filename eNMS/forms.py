@@ -808,6 +808,9 @@ class ServiceForm(BaseForm):
         ),
         no_search=True,
     )
+    sandbox = BooleanField(
+        "Run Python code in a process pool sandbox", help="common/sandbox"
+    )
     admin_only = BooleanField("Admin Only", default=False)
     log_level = SelectField(
         "Logging",
@@ -891,6 +894,7 @@ class ServiceForm(BaseForm):
             "parameterized_form_template",
         ],
         "step1-3": [
+            "sandbox",
             "preprocessing",
             "skip_query",
             "skip_value",
@@ -1166,6 +1170,8 @@ class ConnectionForm(ServiceForm):
     start_new_connection = BooleanField("Start New Connection")
     connection_name = StringField("Connection Name", default="default")
     close_connection = BooleanField("Close Connection")
+    use_command_cache = BooleanField("Reuse command output from earlier services")
+    command_cache_ttl = IntegerField("Command Output Cache TTL (seconds)", default=300)
     groups = {
         "Connection Parameters": {
             "commands": [
@@ -1176,6 +1182,8 @@ class ConnectionForm(ServiceForm):
                 "start_new_connection",
                 "connection_name",
                 "close_connection",
+                "use_command_cache",
+                "command_cache_ttl",
             ],
             "default": "expanded",
         }
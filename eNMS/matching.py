@@ -0,0 +1,48 @@
+from collections import Counter
+
+
+class DictionaryMatch:
+    def __init__(self, match):
+        self.match = match
+        self.counters = {
+            key: Counter(map(self.freeze, value))
+            for key, value in match.items()
+            if isinstance(value, list)
+        }
+
+    def __call__(self, result):
+        remaining = set(self.match)
+        self.walk(result, remaining, {})
+        return not remaining
+
+    @classmethod
+    def freeze(cls, value):
+        if isinstance(value, dict):
+            return frozenset((key, cls.freeze(item)) for key, item in value.items())
+        elif isinstance(value, list):
+            return tuple(map(cls.freeze, value))
+        else:
+            return value
+
+    def walk(self, result, remaining, counters):
+        if isinstance(result, dict):
+            for key, value in result.items():
+                if not remaining:
+                    return
+                elif key not in remaining:
+                    self.walk(value, remaining, counters)
+                elif key in self.counters and isinstance(value, list):
+                    if key not in counters:
+                        counters[key] = self.counters[key].copy()
+                    counters[key] -= Counter(map(self.freeze, value))
+                    if counters[key]:
+                        self.walk(value, remaining, counters)
+                    else:
+                        remaining.discard(key)
+                elif self.match[key] == value:
+                    remaining.discard(key)
+                else:
+                    self.walk(value, remaining, counters)
+        elif isinstance(result, list):
+            for item in result:
+                self.walk(item, remaining, counters)
@@ -213,6 +213,7 @@ class Changelog(AbstractBase):
     id = db.Column(Integer, primary_key=True)
     time = db.Column(db.TinyString, index=True)
     content = db.Column(db.LargeString)
+    diff = db.Column(db.Dict, info={"log_change": False})
     severity = db.Column(db.TinyString, default="debug")
     user = db.Column(db.SmallString, default="admin")
 
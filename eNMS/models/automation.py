@@ -8,6 +8,7 @@ from sqlalchemy import Boolean, case, ForeignKey, Integer
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import deferred, relationship
+from sqlalchemy.schema import Index
 
 from eNMS.controller import controller
 from eNMS.database import db
@@ -93,6 +94,7 @@ class Service(AbstractBase):
     preprocessing = db.Column(db.LargeString)
     postprocessing = db.Column(db.LargeString)
     postprocessing_mode = db.Column(db.TinyString, default="success")
+    sandbox = db.Column(Boolean, default=False)
     log_level = db.Column(Integer, default=1)
     logs = relationship(
         "ServiceLog",
@@ -229,6 +231,8 @@ class ConnectionService(Service):
     start_new_connection = db.Column(Boolean, default=False)
     connection_name = db.Column(db.SmallString, default="default")
     close_connection = db.Column(Boolean, default=False)
+    use_command_cache = db.Column(Boolean, default=False)
+    command_cache_ttl = db.Column(Integer, default=300)
     __mapper_args__ = {"polymorphic_identity": "connection_service"}
 
 
@@ -272,6 +276,12 @@ class Result(AbstractBase):
     workflow_name = association_proxy(
         "workflow", "scoped_name", info={"name": "workflow_name"}
     )
+    __table_args__ = (
+        Index(
+            "ix_result_runtime_service_device", parent_runtime, service_id, device_id
+        ),
+        Index("ix_result_runtime_workflow", parent_runtime, workflow_id),
+    )
 
     def __getitem__(self, key):
         return self.result[key]
@@ -372,6 +382,7 @@ class Run(AbstractBase):
     worker = relationship("Worker", back_populates="runs")
     state = db.Column(db.Dict, info={"log_change": False})
     results = relationship("Result", back_populates="run", cascade="all, delete-orphan")
+    __table_args__ = (Index("ix_run_service_runtime", service_id, runtime),)
     model_properties = {
         "progress": "str",
         "server_properties": "dict",
@@ -480,6 +491,10 @@ class Run(AbstractBase):
         db.session.commit()
         vs.run_targets.pop(self.runtime)
         vs.run_services.pop(self.runtime)
+        vs.run_changed_paths.pop(self.runtime, None)
+        vs.command_cache.pop(self.runtime, None)
+        vs.run_results.pop(self.runtime, None)
+        vs.run_device_logs.pop(self.runtime, None)
         return self.service_run.results
 
 
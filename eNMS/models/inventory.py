@@ -1,5 +1,5 @@
 from re import search, sub
-from sqlalchemy import and_, Boolean, event, ForeignKey, Integer, or_
+from sqlalchemy import Boolean, event, ForeignKey, Integer
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.orm import backref, deferred, relationship
 from sqlalchemy.schema import UniqueConstraint
@@ -7,6 +7,7 @@ from sqlalchemy.schema import UniqueConstraint
 from eNMS.controller import controller
 from eNMS.models.base import AbstractBase
 from eNMS.database import db
+from eNMS.topology import topology
 from eNMS.variables import vs
 
 
@@ -100,29 +101,35 @@ class Device(Node):
         "Session", back_populates="device", cascade="all, delete-orphan"
     )
 
+    @classmethod
+    def configure_events(cls):
+        topology.configure_model_events(cls, "name")
+
     @classmethod
     def database_init(cls):
         for property in vs.configuration_properties:
             for timestamp in vs.timestamps:
                 column = db.Column(db.SmallString, default="Never")
                 setattr(cls, f"last_{property}_{timestamp}", column)
+            column = db.Column(db.TinyString, info={"log_change": False})
+            setattr(cls, f"{property}_hash", column)
         return cls
 
     def get_neighbors(self, object_type, direction="both", **link_constraints):
-        filters = [
-            vs.models["link"].destination == self,
-            vs.models["link"].source == self,
-        ]
-        edge_constraints = (
-            filters if direction == "both" else [filters[direction == "source"]]
-        )
+        edges = topology.adjacent(self.id, direction)
+        if not edges:
+            return []
+        elif "link" not in object_type and not link_constraints:
+            device = vs.models["device"]
+            neighbors = set(edges.values())
+            return db.query("device").filter(device.id.in_(neighbors)).all()
         link_constraints = [
             getattr(vs.models["link"], key) == value
             for key, value in link_constraints.items()
         ]
         neighboring_links = (
             db.query("link")
-            .filter(and_(or_(*edge_constraints), *link_constraints))
+            .filter(vs.models["link"].id.in_(edges), *link_constraints)
             .all()
         )
         if "link" in object_type:
@@ -239,6 +246,10 @@ class Link(Object):
     )
     __table_args__ = (UniqueConstraint(name, source_id, destination_id),)
 
+    @classmethod
+    def configure_events(cls):
+        topology.configure_model_events(cls, "source_id", "destination_id")
+
     @property
     def view_properties(self):
         node_properties = ("id", "longitude", "latitude")
@@ -29,6 +29,7 @@ class NapalmConfigurationService(ConnectionService):
             logger="security",
         )
         config = "\n".join(run.sub(run.content, locals()).splitlines())
+        run.invalidate_command_cache(device)
         getattr(napalm_connection, run.action)(config=config)
         napalm_connection.commit_config()
         return {"success": True, "result": f"Config push ({config})"}
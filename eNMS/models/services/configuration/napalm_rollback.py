@@ -20,6 +20,7 @@ class NapalmRollbackService(ConnectionService):
     def job(self, run, device):
         napalm_connection = run.napalm_connection(device)
         run.log("info", "Configuration Rollback with NAPALM", device)
+        run.invalidate_command_cache(device)
         napalm_connection.rollback()
         return {"success": True, "result": "Rollback successful"}
 
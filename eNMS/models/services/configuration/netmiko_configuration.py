@@ -39,6 +39,7 @@ class NetmikoConfigurationService(ConnectionService):
             device,
             logger="security",
         )
+        run.invalidate_command_cache(device)
         netmiko_connection.send_config_set(
             config.splitlines(),
             enter_config_mode=run.config_mode,
@@ -3,7 +3,6 @@ from flask_wtf import FlaskForm
 from pathlib import Path
 from re import M, sub
 from sqlalchemy import ForeignKey, Integer
-from sqlalchemy.orm import load_only
 from wtforms import FormField
 
 from eNMS.database import db
@@ -36,7 +35,7 @@ class NapalmBackupService(ConnectionService):
 
     def job(self, run, device):
         local_path = run.sub(run.local_path, locals())
-        path = Path.cwd() / local_path / device.name
+        path = vs.get_device_path(device.name, Path.cwd() / local_path)
         path.mkdir(parents=True, exist_ok=True)
         try:
             runtime = datetime.now()
@@ -58,26 +57,19 @@ class NapalmBackupService(ConnectionService):
                 except Exception as exc:
                     result[getter] = f"{getter} failed because of {exc}"
             result = vs.dict_to_string(result)
-            device_with_deferred_data = (
-                db.query("device")
-                .options(load_only(getattr(vs.models["device"], self.property)))
-                .filter_by(id=device.id)
-                .one()
-            )
-            setattr(device_with_deferred_data, self.property, result)
-            with open(path / self.property, "w") as file:
-                file.write(result)
             setattr(device, f"last_{self.property}_status", "Success")
             duration = f"{(datetime.now() - runtime).total_seconds()}s"
             setattr(device, f"last_{self.property}_duration", duration)
-            setattr(device, f"last_{self.property}_update", str(runtime))
-            run.update_configuration_properties(path, self.property, device)
+            changed = run.update_configuration(device, self.property, path, result)
+            if changed:
+                setattr(device, f"last_{self.property}_update", str(runtime))
+                run.update_configuration_properties(path, self.property, device)
         except Exception as exc:
             setattr(device, f"last_{self.property}_status", "Failure")
             setattr(device, f"last_{self.property}_failure", str(runtime))
             run.update_configuration_properties(path, self.property, device)
             return {"success": False, "result": str(exc)}
-        return {"success": True}
+        return {"success": True, "changed": changed}
 
 
 class ReplacementForm(FlaskForm):
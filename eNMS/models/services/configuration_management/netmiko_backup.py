@@ -1,8 +1,7 @@
 from datetime import datetime
 from pathlib import Path
-from re import M, sub
+from re import compile, M
 from sqlalchemy import Boolean, Float, ForeignKey, Integer
-from sqlalchemy.orm import load_only
 from wtforms import FormField
 
 from eNMS.database import db
@@ -50,7 +49,7 @@ class NetmikoBackupService(ConnectionService):
 
     def job(self, run, device):
         local_path = run.sub(run.local_path, locals())
-        path = Path.cwd() / local_path / device.name
+        path = vs.get_device_path(device.name, Path.cwd() / local_path)
         path.mkdir(parents=True, exist_ok=True)
         try:
             runtime = datetime.now()
@@ -67,7 +66,9 @@ class NetmikoBackupService(ConnectionService):
                     title += f" [{command['prefix']}]"
                 header = f"\n{' ' * 30}{title}\n" f"{' ' * 30}{'*' * len(title)}"
                 command_result = [f"{header}\n\n"] if self.add_header else []
-                for line in netmiko_connection.send_command(
+                for line in run.send_command(
+                    netmiko_connection,
+                    device,
                     command["value"],
                     read_timeout=run.read_timeout,
                 ).splitlines():
@@ -77,29 +78,24 @@ class NetmikoBackupService(ConnectionService):
                 result.append("\n".join(command_result))
             result = "\n\n".join(result)
             for replacement in self.replacements:
-                result = sub(
-                    replacement["pattern"], replacement["replace_with"], result, flags=M
+                pattern = replacement["pattern"]
+                regex = vs.get_template(
+                    ("regex", pattern, M), lambda: compile(pattern, flags=M)
                 )
-            device_with_deferred_data = (
-                db.query("device")
-                .options(load_only(getattr(vs.models["device"], self.property)))
-                .filter_by(id=device.id)
-                .one()
-            )
+                result = regex.sub(replacement["replace_with"], result)
             setattr(device, f"last_{self.property}_status", "Success")
             duration = f"{(datetime.now() - runtime).total_seconds()}s"
             setattr(device, f"last_{self.property}_duration", duration)
-            if getattr(device_with_deferred_data, self.property) != result:
-                setattr(device_with_deferred_data, self.property, result)
-                with open(path / self.property, "w") as file:
-                    file.write(result)
+            changed = run.update_configuration(device, self.property, path, result)
+            if changed:
                 setattr(device, f"last_{self.property}_update", str(runtime))
         except Exception as exc:
             setattr(device, f"last_{self.property}_status", "Failure")
             setattr(device, f"last_{self.property}_failure", str(runtime))
             return {"success": False, "result": str(exc)}
-        run.update_configuration_properties(path, self.property, device)
-        return {"success": True}
+        if changed:
+            run.update_configuration_properties(path, self.property, device)
+        return {"success": True, "changed": changed}
 
 
 class NetmikoBackupForm(NetmikoForm):
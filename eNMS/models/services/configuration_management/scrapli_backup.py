@@ -2,7 +2,6 @@ from datetime import datetime
 from pathlib import Path
 from re import M, sub
 from sqlalchemy import Boolean, Float, ForeignKey, Integer
-from sqlalchemy.orm import load_only
 from wtforms import FormField
 
 from eNMS.database import db
@@ -35,7 +34,7 @@ class ScrapliBackupService(ConnectionService):
 
     def job(self, run, device):
         local_path = run.sub(run.local_path, locals())
-        path = Path.cwd() / local_path / device.name
+        path = vs.get_device_path(device.name, Path.cwd() / local_path)
         path.mkdir(parents=True, exist_ok=True)
         try:
             runtime = datetime.now()
@@ -69,26 +68,19 @@ class ScrapliBackupService(ConnectionService):
                 result = sub(
                     replacement["pattern"], replacement["replace_with"], result, flags=M
                 )
-            device_with_deferred_data = (
-                db.query("device")
-                .options(load_only(getattr(vs.models["device"], self.property)))
-                .filter_by(id=device.id)
-                .one()
-            )
             setattr(device, f"last_{self.property}_status", "Success")
             duration = f"{(datetime.now() - runtime).total_seconds()}s"
             setattr(device, f"last_{self.property}_duration", duration)
-            if getattr(device_with_deferred_data, self.property) != result:
-                setattr(device_with_deferred_data, self.property, result)
-                with open(path / self.property, "w") as file:
-                    file.write(result)
+            changed = run.update_configuration(device, self.property, path, result)
+            if changed:
                 setattr(device, f"last_{self.property}_update", str(runtime))
         except Exception:
             setattr(device, f"last_{self.property}_status", "Failure")
             setattr(device, f"last_{self.property}_failure", str(runtime))
             return {"success": False, "result": format_exc()}
-        run.update_configuration_properties(path, self.property, device)
-        return {"success": True}
+        if changed:
+            run.update_configuration_properties(path, self.property, device)
+        return {"success": True, "changed": changed}
 
 
 class ScrapliBackupForm(ScrapliForm):
@@ -63,7 +63,9 @@ class NetmikoValidationService(ConnectionService):
             )
             commands = commands.splitlines()
             result = [
-                netmiko_connection.send_command(
+                run.send_command(
+                    netmiko_connection,
+                    device,
                     command,
                     use_textfsm=run.use_textfsm,
                     use_genie=run.use_genie,
@@ -33,6 +33,8 @@ class ScrapliService(ConnectionService):
             commands = run.sub(run.commands, locals())
         commands = commands.splitlines()
         function = "send_configs" if run.is_configuration else "send_commands"
+        if run.is_configuration:
+            run.invalidate_command_cache(device)
         run.log(
             "info",
             f"sending COMMANDS {commands} with Scrapli",
@@ -1,7 +1,6 @@
 from glob import glob
 from os.path import split
 from pathlib import Path
-from paramiko import SSHClient, AutoAddPolicy
 from sqlalchemy import Boolean, Float, ForeignKey, Integer
 from sqlalchemy.orm import relationship
 from wtforms.validators import InputRequired
@@ -41,23 +40,20 @@ class GenericFileTransferService(Service):
     named_credential = relationship("Credential")
     custom_username = db.Column(db.SmallString)
     custom_password = db.Column(db.SmallString)
+    transfer_channels = db.Column(Integer, default=4)
+    skip_identical_files = db.Column(Boolean, default=False)
+    verify_checksum = db.Column(Boolean, default=False)
 
     __mapper_args__ = {"polymorphic_identity": "generic_file_transfer_service"}
 
     def job(self, run, device):
-        ssh_client = SSHClient()
-        if run.missing_host_key_policy:
-            ssh_client.set_missing_host_key_policy(AutoAddPolicy())
-        if run.load_known_host_keys:
-            ssh_client.load_system_host_keys()
         source = run.sub(run.source_file, locals())
         destination = run.sub(run.destination_file, locals())
         if run.direction == "put" and str(vs.file_path) not in source:
             source = f"{vs.file_path}{source}"
         if run.direction == "get" and str(vs.file_path) not in destination:
             destination = f"{vs.file_path}{destination}"
-        credentials = run.get_credentials(device, add_secret=False)
-        ssh_client.connect(device.ip_address, look_for_keys=False, **credentials)
+        ssh_client = run.paramiko_connection(device)
         if run.source_file_includes_globbing:
             glob_source_file_list = glob(source, recursive=False)
             if not glob_source_file_list:
@@ -79,9 +75,9 @@ class GenericFileTransferService(Service):
             files = [(source, destination)]
         log = ", ".join("Transferring {} to {}".format(*pairs) for pairs in files)
         run.log("info", log, device)
-        run.transfer_file(ssh_client, files)
-        ssh_client.close()
-        return {"success": True, "result": "Transfer successful"}
+        transfers = run.transfer_file(ssh_client, files)
+        success = all(transfer.get("checksum_verified", True) for transfer in transfers)
+        return {"success": success, "result": transfers}
 
 
 class GenericFileTransferForm(ServiceForm):
@@ -107,6 +103,11 @@ class GenericFileTransferForm(ServiceForm):
     named_credential = InstanceField("Named Credential", model="credential")
     custom_username = StringField("Custom Username", substitution=True)
     custom_password = PasswordField("Custom Password", substitution=True)
+    transfer_channels = IntegerField("Concurrent transfer channels", default=4)
+    skip_identical_files = BooleanField(
+        "Skip files already present with the same size and checksum"
+    )
+    verify_checksum = BooleanField("Verify checksum after transfer")
 
     def validate(self, **_):
         valid_form = super().validate()
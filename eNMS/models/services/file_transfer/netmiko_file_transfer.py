@@ -1,4 +1,4 @@
-from netmiko import file_transfer
+from importlib import import_module
 from sqlalchemy import Boolean, Float, ForeignKey, Integer
 from wtforms.validators import InputRequired
 
@@ -42,7 +42,7 @@ class NetmikoFileTransferService(ConnectionService):
             destination = f"{vs.file_path}{destination}"
         run.log("info", f"Transferring file {source}", device)
         netmiko_connection.password = run.get_credentials(device).get("password")
-        transfer_dict = file_transfer(
+        transfer_dict = import_module("netmiko").file_transfer(
             netmiko_connection,
             source_file=source,
             dest_file=destination,
@@ -1,7 +1,10 @@
-from json import dumps
+from json import dump, dumps, loads
+from json.decoder import JSONDecodeError
+from os import environ
 from re import search
 from sqlalchemy import Boolean, ForeignKey, Integer
-from subprocess import check_output
+from subprocess import check_output, run as run_subprocess
+from tempfile import NamedTemporaryFile
 from traceback import format_exc
 
 from eNMS.database import db
@@ -10,6 +13,7 @@ from eNMS.fields import (
     BooleanField,
     DictField,
     HiddenField,
+    IntegerField,
     SelectField,
     StringField,
 )
@@ -26,6 +30,8 @@ class AnsiblePlaybookService(Service):
     options = db.Column(db.Dict)
     pass_device_properties = db.Column(Boolean, default=False)
     credentials = db.Column(db.SmallString, default="device")
+    batch_inventory = db.Column(Boolean, default=False)
+    forks = db.Column(Integer, default=5)
 
     exit_codes = {
         "0": "OK or no hosts matched",
@@ -41,6 +47,8 @@ class AnsiblePlaybookService(Service):
     __mapper_args__ = {"polymorphic_identity": "ansible_playbook_service"}
 
     def job(self, run, device=None):
+        if run.batch_inventory and not device:
+            return self.batch_job(run)
         arguments = run.sub(run.arguments, locals()).split()
         command, extra_args = ["ansible-playbook"], {}
         if run.pass_device_properties:
@@ -81,6 +89,78 @@ class AnsiblePlaybookService(Service):
             pass
         return {"command": full_command, "result": result}
 
+    def batch_job(self, run):
+        hosts = {}
+        for device in run.target_devices:
+            hosts[device.name] = {"ansible_host": device.ip_address}
+            if run.pass_device_properties:
+                credentials = run.get_credentials(device)
+                credentials.pop("pkey", None)
+                hosts[device.name].update({**device.get_properties(), **credentials})
+        arguments = run.sub(run.arguments, locals()).split()
+        command = ["ansible-playbook", "-f", str(run.forks)]
+        extra_args = run.sub(run.options, locals()) if run.options else {}
+        if extra_args:
+            command.extend(["-e", dumps(extra_args)])
+        password = extra_args.get("password")
+        with NamedTemporaryFile("w", suffix=".json") as inventory:
+            dump({"all": {"hosts": hosts}}, inventory, default=str)
+            inventory.flush()
+            command.extend(["-i", inventory.name])
+            command.append(f"{vs.playbook_path}{run.playbook_path}")
+            full_command = " ".join(command + arguments)
+            if password:
+                full_command = full_command.replace(password, "*" * 10)
+            run.log(
+                "info",
+                f"Sending Ansible playbook to {len(hosts)} hosts: {full_command}",
+                logger="security",
+            )
+            process = run_subprocess(
+                command + arguments,
+                cwd=vs.playbook_path,
+                env={**environ, "ANSIBLE_STDOUT_CALLBACK": "json"},
+                capture_output=True,
+                text=True,
+            )
+        exit_code = str(process.returncode)
+        results = {
+            "command": full_command,
+            "exit_code": self.exit_codes.get(exit_code, exit_code),
+        }
+        try:
+            output = loads(process.stdout)
+        except JSONDecodeError:
+            result = f"{process.stdout}\n{process.stderr}"
+            if password:
+                result = result.replace(password, "*" * 10)
+            return {"success": False, "result": result, **results}
+        summary = {"success": [], "failure": []}
+        for device in run.target_devices:
+            stats = output["stats"].get(device.name)
+            tasks = [
+                {"task": task["task"]["name"], **task["hosts"][device.name]}
+                for play in output["plays"]
+                for task in play["tasks"]
+                if device.name in task["hosts"]
+            ]
+            success = bool(stats) and not stats["failures"] and not stats["unreachable"]
+            summary["success" if success else "failure"].append(device.name)
+            device_result = {
+                "device_target": device.name,
+                "runtime": vs.get_time(),
+                "success": success,
+                "result": {"stats": stats, "tasks": tasks},
+            }
+            run.create_result(device_result, device, commit=False)
+        success = not summary["failure"]
+        return {
+            "success": success,
+            "summary": summary,
+            "result": output["stats"],
+            **results,
+        }
+
 
 class AnsiblePlaybookForm(ServiceForm):
     form_type = HiddenField(default="ansible_playbook_service")
@@ -103,3 +183,19 @@ class AnsiblePlaybookForm(ServiceForm):
         substitution=True,
         help="ansible/options",
     )
+    batch_inventory = BooleanField(
+        "Run all targets in a single playbook (batched inventory)"
+    )
+    forks = IntegerField("Forks (batched inventory)", default=5)
+
+    def validate(self, **_):
+        valid_form = super().validate()
+        batch_inventory_error = (
+            self.batch_inventory.data and self.run_method.data != "once"
+        )
+        if batch_inventory_error:
+            self.batch_inventory.errors.append(
+                "Batched inventory requires the service 'Run Method' "
+                "to be set to 'Run Once'"
+            )
+        return valid_form and not batch_inventory_error
@@ -6,6 +6,7 @@ from eNMS.database import db
 from eNMS.forms import ServiceForm
 from eNMS.fields import BooleanField, HiddenField, SelectMultipleField, StringField
 from eNMS.models.automation import Service
+from eNMS.variables import vs
 
 
 class GitService(Service):
@@ -36,6 +37,17 @@ class GitService(Service):
         if "add_commit" in self.actions:
             repo.git.add(A=True)
             repo.git.commit(m=f'"{self.commit_message}"')
+        if "commit_run_changes" in self.actions:
+            root = Path(repo.working_tree_dir).resolve()
+            changed_paths = [
+                str(path.resolve().relative_to(root))
+                for path in vs.run_changed_paths.get(run.parent_runtime, ())
+                if root in path.resolve().parents
+            ]
+            run.log("info", f"Committing {len(changed_paths)} changed files")
+            if changed_paths:
+                repo.index.add(changed_paths)
+                repo.index.commit(self.commit_message)
         if "pull" in self.actions:
             repo.remotes.origin.pull()
         if "push" in self.actions:
@@ -50,6 +62,7 @@ class GitForm(ServiceForm):
             ("clone", "Clone"),
             ("shallow_clone", "Shallow Clone"),
             ("add_commit", "Do 'git add' and commit"),
+            ("commit_run_changes", "Commit files changed during the run"),
             ("pull", "Pull"),
             ("push", "Push"),
         )
@@ -1,7 +1,16 @@
+from asyncio import gather, run as asyncio_run, Semaphore, sleep
+from collections import defaultdict
 from requests.auth import HTTPBasicAuth
 from sqlalchemy import Boolean, ForeignKey, Integer
 from sqlalchemy.orm import relationship
 from sqlalchemy.types import JSON
+from urllib.parse import urlsplit
+from warnings import warn
+
+try:
+    from httpx import AsyncClient, Limits, TransportError
+except ImportError as exc:
+    warn(f"Couldn't import httpx module ({exc})")
 
 from eNMS.database import db
 from eNMS.environment import env
@@ -17,6 +26,7 @@ from eNMS.fields import (
 )
 from eNMS.forms import ServiceForm
 from eNMS.models.automation import Service
+from eNMS.variables import vs
 
 
 class RestCallService(Service):
@@ -35,10 +45,27 @@ class RestCallService(Service):
     named_credential = relationship("Credential")
     custom_username = db.Column(db.SmallString)
     custom_password = db.Column(db.SmallString)
+    fan_out = db.Column(Boolean, default=False)
+    concurrency = db.Column(Integer, default=100)
+    connections_per_host = db.Column(Integer, default=10)
+    http2 = db.Column(Boolean, default=False)
+    rate_limit = db.Column(Integer, default=0)
+    fan_out_retries = db.Column(Integer, default=3)
 
     __mapper_args__ = {"polymorphic_identity": "rest_call_service"}
 
     def job(self, run, device=None):
+        if run.fan_out and not device:
+            return self.fan_out_job(run)
+        rest_url, log_url, kwargs = self.build_request(run, device)
+        kwargs["verify"] = run.verify_ssl_certificate
+        if "auth" in kwargs:
+            kwargs["auth"] = HTTPBasicAuth(*kwargs["auth"])
+        call = getattr(env.request_session, run.call_type.lower())
+        response = call(rest_url, **kwargs)
+        return self.format_response(log_url, response)
+
+    def build_request(self, run, device):
         local_variables = locals()
         rest_url = run.sub(run.rest_url, local_variables)
         log_url = run.rest_url if "get_credential" in run.rest_url else rest_url
@@ -47,16 +74,14 @@ class RestCallService(Service):
             parameter: run.sub(getattr(self, parameter), local_variables)
             for parameter in ("headers", "params", "timeout")
         }
-        kwargs["verify"] = run.verify_ssl_certificate
         credentials = run.get_credentials(device)
         if self.credentials != "custom" or credentials["username"]:
-            kwargs["auth"] = HTTPBasicAuth(
-                credentials["username"], credentials["password"]
-            )
+            kwargs["auth"] = (credentials["username"], credentials["password"])
         if run.call_type in ("POST", "PUT", "PATCH"):
             kwargs["json"] = run.sub(self.payload, local_variables)
-        call = getattr(env.request_session, run.call_type.lower())
-        response = call(rest_url, **kwargs)
+        return rest_url, log_url, kwargs
+
+    def format_response(self, log_url, response):
         result = {
             "url": log_url,
             "status_code": response.status_code,
@@ -67,6 +92,60 @@ class RestCallService(Service):
             result["success"] = False
         return result
 
+    def fan_out_job(self, run):
+        requests = [self.build_request(run, device) for device in run.target_devices]
+        responses = asyncio_run(self.send_requests(run, requests))
+        summary = {"success": [], "failure": []}
+        for device, result in zip(run.target_devices, responses):
+            result.setdefault("success", True)
+            summary["success" if result["success"] else "failure"].append(device.name)
+            device_result = {
+                "device_target": device.name,
+                "runtime": vs.get_time(),
+                **result,
+            }
+            run.create_result(device_result, device, commit=False)
+        return {"success": not summary["failure"], "summary": summary}
+
+    async def send_requests(self, run, requests):
+        throttle = run.rate_limiter(run.rate_limit)
+        host_semaphores = defaultdict(lambda: Semaphore(run.connections_per_host))
+        limits = Limits(
+            max_connections=run.concurrency,
+            max_keepalive_connections=run.concurrency,
+        )
+        backoff_factor = vs.settings["requests"]["retries"]["backoff_factor"]
+
+        async def send_request(client, rest_url, log_url, kwargs):
+            async with host_semaphores[urlsplit(rest_url).netloc]:
+                for attempt in range(run.fan_out_retries + 1):
+                    await throttle()
+                    try:
+                        response = await client.request(
+                            run.call_type, rest_url, **kwargs
+                        )
+                        if response.status_code not in (429, 502, 503, 504):
+                            return self.format_response(log_url, response)
+                        error = f"HTTP {response.status_code}"
+                    except TransportError as exc:
+                        error = str(exc)
+                    if attempt < run.fan_out_retries:
+                        await sleep(backoff_factor * 2**attempt)
+                return {"url": log_url, "success": False, "error": error}
+
+        async with AsyncClient(
+            http2=run.http2, limits=limits, verify=run.verify_ssl_certificate
+        ) as client:
+            responses = await gather(
+                *(send_request(client, *request) for request in requests),
+                return_exceptions=True,
+            )
+        for index, (_, log_url, _) in enumerate(requests):
+            if isinstance(responses[index], Exception):
+                error = str(responses[index])
+                responses[index] = {"url": log_url, "success": False, "error": error}
+        return responses
+
 
 class RestCallForm(ServiceForm):
     form_type = HiddenField(default="rest_call_service")
@@ -96,15 +175,29 @@ class RestCallForm(ServiceForm):
     named_credential = InstanceField("Named Credential", model="credential")
     custom_username = StringField("Custom Username", substitution=True)
     custom_password = PasswordField("Custom Password", substitution=True)
+    fan_out = BooleanField("Send one call per target device concurrently (fan-out)")
+    concurrency = IntegerField("Maximum concurrent connections", default=100)
+    connections_per_host = IntegerField("Maximum connections per host", default=10)
+    http2 = BooleanField("Use HTTP/2")
+    rate_limit = IntegerField("Maximum calls per second (0 = no limit)", default=0)
+    fan_out_retries = IntegerField("Retries on failure", default=3)
 
     def validate(self, **_):
         valid_form = super().validate()
         device_credentials_error = (
-            self.credentials.data == "device" and self.run_method.data == "once"
+            self.credentials.data == "device"
+            and self.run_method.data == "once"
+            and not self.fan_out.data
         )
         if device_credentials_error:
             self.credentials.errors.append(
                 "Device credentials cannot be selected because the service "
                 "'Run Method' is not set to 'Run Once per Device'"
             )
-        return valid_form and not device_credentials_error
+        fan_out_error = self.fan_out.data and self.run_method.data != "once"
+        if fan_out_error:
+            self.fan_out.errors.append(
+                "The fan-out mode requires the service 'Run Method' "
+                "to be set to 'Run Once'"
+            )
+        return valid_form and not device_credentials_error and not fan_out_error
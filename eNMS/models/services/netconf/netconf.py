@@ -27,6 +27,8 @@ class NetconfService(ConnectionService):
     copy_destination = db.Column(db.SmallString)
     destination_url = db.Column(db.SmallString)
     xml_conversion = db.Column(Boolean, default=True)
+    xpath_selectors = db.Column(db.LargeString, default="")
+    store_raw_reply = db.Column(Boolean, default=False)
 
     __mapper_args__ = {"polymorphic_identity": "netconf_service"}
 
@@ -35,6 +37,8 @@ class NetconfService(ConnectionService):
         run.log("info", "Sending NETCONF request", device, logger="security")
         result = {"success": False, "result": "No NETCONF operation selected."}
         manager = run.ncclient_connection(device)
+        if run.nc_type in ("push_config", "copy_config") or run.commit_conf:
+            run.invalidate_command_cache(device)
         if run.lock:
             manager.lock(target=run.target)
         if run.nc_type == "get_config":
@@ -64,10 +68,13 @@ class NetconfService(ConnectionService):
             manager.commit()
         if run.nc_type == "rpc":
             result = manager.rpc(str(xml_filter)).data_xml
-        if run.xml_conversion:
-            result = xmltodict.parse(str(result))
         if run.unlock:
             manager.unlock(target=run.target)
+        if run.nc_type in ("get_config", "get_filtered_config", "rpc"):
+            reply = run.process_xml_reply(result, device, run.xml_conversion)
+            return {"success": True, **reply}
+        if run.xml_conversion:
+            result = xmltodict.parse(str(result))
         return {"success": True, "result": result}
 
 
@@ -160,15 +167,28 @@ class NetconfForm(ConnectionForm):
     xml_conversion = BooleanField(
         label="Convert XML result to dictionary", default=True
     )
+    xpath_selectors = StringField(
+        label="Extract only these XPath subtrees (one per line, streamed)",
+        widget=TextArea(),
+        render_kw={"rows": 3},
+    )
+    store_raw_reply = BooleanField(label="Store compressed raw reply on disk")
 
     @classmethod
     def form_init(cls):
         parameters = {
-            "get_config": ["target", "xml_conversion"],
+            "get_config": [
+                "target",
+                "xml_conversion",
+                "xpath_selectors",
+                "store_raw_reply",
+            ],
             "get_filtered_config": [
                 "target",
                 "xml_filter",
                 "xml_conversion",
+                "xpath_selectors",
+                "store_raw_reply",
             ],
             "push_config": [
                 "target",
@@ -189,7 +209,12 @@ class NetconfForm(ConnectionForm):
                 "commit_conf",
                 "xml_conversion",
             ],
-            "rpc": ["xml_filter", "xml_conversion"],
+            "rpc": [
+                "xml_filter",
+                "xml_conversion",
+                "xpath_selectors",
+                "store_raw_reply",
+            ],
         }
         list_parameters = list(set(sum(parameters.values(), [])))
         cls.groups = {
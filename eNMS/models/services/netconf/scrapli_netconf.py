@@ -17,6 +17,8 @@ class ScrapliNetconfService(ConnectionService):
     content = db.Column(db.LargeString)
     commit_config = db.Column(Boolean, default=False)
     strip_namespaces = db.Column(Boolean, default=False)
+    xpath_selectors = db.Column(db.LargeString, default="")
+    store_raw_reply = db.Column(Boolean, default=False)
 
     __mapper_args__ = {"polymorphic_identity": "scrapli_netconf_service"}
 
@@ -30,10 +32,17 @@ class ScrapliNetconfService(ConnectionService):
             kwargs[parameter] = content
         if run.command == "get":
             kwargs["filter_type"] = "subtree"
+        if run.command == "edit_config" or run.commit_config:
+            run.invalidate_command_cache(device)
         response = getattr(run.scrapli_connection(device), run.command)(**kwargs)
         if run.commit_config:
             run.scrapli_connection(device).commit()
-        return {"filter_": filter, "kwargs": kwargs, "result": response.result}
+        results = {"filter_": filter, "kwargs": kwargs}
+        if run.command in ("get", "get_config", "rpc"):
+            results.update(run.process_xml_reply(response.result, device, False))
+        else:
+            results["result"] = response.result
+        return results
 
 
 class ScrapliNetconfForm(ConnectionForm):
@@ -61,6 +70,12 @@ class ScrapliNetconfForm(ConnectionForm):
     content = StringField(substitution=True, widget=TextArea(), render_kw={"rows": 5})
     commit_config = BooleanField("Commit After Editing Configuration")
     strip_namespaces = BooleanField("Strip Namespaces from returned XML")
+    xpath_selectors = StringField(
+        "Extract only these XPath subtrees (one per line, streamed)",
+        widget=TextArea(),
+        render_kw={"rows": 3},
+    )
+    store_raw_reply = BooleanField("Store compressed raw reply on disk")
     groups = {
         "Main Parameters": {
             "commands": [
@@ -69,6 +84,8 @@ class ScrapliNetconfForm(ConnectionForm):
                 "content",
                 "commit_config",
                 "strip_namespaces",
+                "xpath_selectors",
+                "store_raw_reply",
             ],
             "default": "expanded",
         },
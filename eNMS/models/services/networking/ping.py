@@ -1,11 +1,44 @@
-from socket import error, gaierror, socket, timeout
+from asyncio import (
+    create_subprocess_exec,
+    gather,
+    get_running_loop,
+    open_connection,
+    run as asyncio_run,
+    Semaphore,
+    TimeoutError as AsyncioTimeoutError,
+    wait_for,
+)
+from asyncio.subprocess import PIPE
+from re import search
+from socket import (
+    AF_INET,
+    error,
+    gaierror,
+    IP_TTL,
+    IPPROTO_ICMP,
+    IPPROTO_IP,
+    SOCK_DGRAM,
+    socket,
+    timeout,
+)
+from statistics import mean, pstdev
+from struct import pack, unpack
 from subprocess import run as sub_run
-from sqlalchemy import ForeignKey, Integer
+from sqlalchemy import Boolean, ForeignKey, Integer
+from time import perf_counter
+from wtforms.validators import NumberRange
 
 from eNMS.database import db
 from eNMS.forms import ServiceForm
-from eNMS.fields import HiddenField, IntegerField, SelectField, StringField
+from eNMS.fields import (
+    BooleanField,
+    HiddenField,
+    IntegerField,
+    SelectField,
+    StringField,
+)
 from eNMS.models.automation import Service
+from eNMS.variables import vs
 
 
 class PingService(Service):
@@ -19,10 +52,15 @@ class PingService(Service):
     timeout = db.Column(Integer, default=2)
     ttl = db.Column(Integer, default=60)
     packet_size = db.Column(Integer, default=56)
+    sweep = db.Column(Boolean, default=False)
+    concurrency = db.Column(Integer, default=500)
+    rate_limit = db.Column(Integer, default=0)
 
     __mapper_args__ = {"polymorphic_identity": "ping_service"}
 
     def job(self, run, device=None):
+        if run.sweep and not device:
+            return self.sweep_job(run)
         ip_address = run.sub(run.ip_address, locals()) or device.ip_address
         if run.protocol == "ICMP":
             command = ["ping"]
@@ -85,6 +123,136 @@ class PingService(Service):
                 result[port] = connection
             return {"success": all(result.values()), "result": result}
 
+    def sweep_job(self, run):
+        addresses = {
+            device: run.sub(run.ip_address, {"device": device}) or device.ip_address
+            for device in run.target_devices
+        }
+        run.log("info", f"Starting {run.protocol} sweep of {len(addresses)} targets")
+        results = asyncio_run(self.probe_targets(run, list(addresses.values())))
+        summary = {"success": [], "failure": []}
+        for device, result in zip(addresses, results):
+            summary["success" if result["success"] else "failure"].append(device.name)
+            device_result = {
+                "device_target": device.name,
+                "runtime": vs.get_time(),
+                **result,
+            }
+            run.create_result(device_result, device, commit=False)
+        return {"success": not summary["failure"], "summary": summary}
+
+    async def probe_targets(self, run, addresses):
+        semaphore = Semaphore(run.concurrency)
+        throttle = run.rate_limiter(run.rate_limit)
+        if run.protocol == "ICMP":
+            try:
+                socket(AF_INET, SOCK_DGRAM, IPPROTO_ICMP).close()
+                probe = self.icmp_probe
+            except PermissionError:
+                run.log("warning", "Unprivileged ICMP unavailable, using 'ping'")
+                probe = self.ping_probe
+        else:
+            probe = self.tcp_probe
+
+        async def limited_probe(address):
+            async with semaphore:
+                try:
+                    return await probe(run, address, throttle)
+                except OSError as exc:
+                    return {"success": False, "result": None, "error": str(exc)}
+
+        return await gather(*(limited_probe(address) for address in addresses))
+
+    async def icmp_probe(self, run, address, throttle):
+        loop, rtts = get_running_loop(), []
+        address = (await loop.getaddrinfo(address, None, family=AF_INET))[0][4][0]
+        with socket(AF_INET, SOCK_DGRAM, IPPROTO_ICMP) as icmp_socket:
+            icmp_socket.setblocking(False)
+            if run.ttl:
+                icmp_socket.setsockopt(IPPROTO_IP, IP_TTL, run.ttl)
+            await loop.sock_connect(icmp_socket, (address, 0))
+            for sequence in range(run.count):
+                await throttle()
+                start = perf_counter()
+                packet = self.icmp_packet(sequence, run.packet_size)
+                await loop.sock_sendall(icmp_socket, packet)
+                try:
+                    while True:
+                        remaining_time = start + run.timeout - perf_counter()
+                        reply = await wait_for(
+                            loop.sock_recv(icmp_socket, 65535), remaining_time
+                        )
+                        if reply[0] == 0 and unpack("!H", reply[6:8])[0] == sequence:
+                            break
+                    rtts.append((perf_counter() - start) * 1000)
+                except AsyncioTimeoutError:
+                    continue
+        return {"success": bool(rtts), "result": self.statistics(run.count, rtts)}
+
+    async def ping_probe(self, run, address, throttle):
+        await throttle()
+        command = ["ping", "-c", str(run.count), "-W", str(run.timeout)]
+        if run.ttl:
+            command.extend(["-t", str(run.ttl)])
+        process = await create_subprocess_exec(
+            *command, "-s", str(run.packet_size), address, stdout=PIPE, stderr=PIPE
+        )
+        output = (await process.communicate())[0].decode()
+        received = search(r"(\d+) (?:packets )?received", output)
+        timing = search(r"= ([\d.]+)/([\d.]+)/([\d.]+)/([\d.]+)", output)
+        result = self.statistics(run.count, [])
+        result["probes_rcvd"] = int(received.group(1)) if received else 0
+        result["packet_loss"] = f"{100 - 100 * result['probes_rcvd'] // run.count}%"
+        if timing:
+            for index, key in enumerate(("min", "avg", "max", "stddev"), 1):
+                result[f"rtt_{key}"] = float(timing.group(index))
+        return {"success": process.returncode == 0, "result": result}
+
+    async def tcp_probe(self, run, address, throttle):
+        result = {}
+        for port in map(int, run.ports.split(",")):
+            rtts = []
+            for _ in range(run.count):
+                await throttle()
+                start = perf_counter()
+                try:
+                    connection = open_connection(address, port)
+                    _, writer = await wait_for(connection, run.timeout)
+                except (AsyncioTimeoutError, OSError):
+                    continue
+                rtts.append((perf_counter() - start) * 1000)
+                writer.close()
+            result[port] = self.statistics(run.count, rtts)
+        success = all(port["probes_rcvd"] for port in result.values())
+        return {"success": success, "result": result}
+
+    @staticmethod
+    def icmp_packet(sequence, size):
+        payload = bytes(size)
+        data = pack("!BBHHH", 8, 0, 0, 0, sequence) + payload + bytes(size % 2)
+        checksum = sum(unpack(f"!{len(data) // 2}H", data))
+        checksum = (checksum >> 16) + (checksum & 0xFFFF)
+        checksum = ~(checksum + (checksum >> 16)) & 0xFFFF
+        return pack("!BBHHH", 8, 0, checksum, 0, sequence) + payload
+
+    @staticmethod
+    def statistics(sent, rtts):
+        statistics = {
+            "probes_sent": sent,
+            "probes_rcvd": len(rtts),
+            "packet_loss": f"{100 - 100 * len(rtts) // sent}%",
+        }
+        if rtts:
+            statistics.update(
+                {
+                    "rtt_min": round(min(rtts), 3),
+                    "rtt_max": round(max(rtts), 3),
+                    "rtt_avg": round(mean(rtts), 3),
+                    "rtt_stddev": round(pstdev(rtts), 3),
+                }
+            )
+        return statistics
+
 
 class PingForm(ServiceForm):
     form_type = HiddenField(default="ping_service")
@@ -95,14 +263,25 @@ class PingForm(ServiceForm):
         ui_name="IP Address (defaults to the device IP address if left empty)",
     )
     ports = StringField("Ports (TCP ping only)", default=22)
-    count = IntegerField(default=5)
+    count = IntegerField(validators=[NumberRange(min=1)], default=5)
     timeout = IntegerField(default=2)
     ttl = IntegerField(default=60)
     packet_size = IntegerField(default=56)
+    sweep = BooleanField("Sweep all targets from a single process")
+    concurrency = IntegerField(
+        "Maximum concurrent targets (sweep)", [NumberRange(min=1)], default=500
+    )
+    rate_limit = IntegerField("Maximum probes per second (sweep, 0 = no limit)")
 
     def validate(self, **_):
         valid_form = super().validate()
         invalid_tcp_port = self.protocol.data == "TCP" and not self.ports.data
         if invalid_tcp_port:
             self.ports.errors.append("You must enter a port for a TCP ping.")
-        return valid_form and not invalid_tcp_port
+        invalid_sweep = self.sweep.data and self.run_method.data != "once"
+        if invalid_sweep:
+            self.sweep.errors.append(
+                "The sweep mode requires the service 'Run Method' "
+                "to be set to 'Run Once'"
+            )
+        return valid_form and not invalid_tcp_port and not invalid_sweep
@@ -1,7 +1,8 @@
+from copy import deepcopy
 from io import StringIO
 from jinja2 import Template
 from json import loads
-from re import findall
+from re import compile
 from sqlalchemy import ForeignKey, Integer
 from textfsm import TextFSM
 from warnings import warn
@@ -16,6 +17,7 @@ from eNMS.database import db
 from eNMS.forms import ServiceForm
 from eNMS.fields import HiddenField, SelectField, StringField
 from eNMS.models.automation import Service
+from eNMS.variables import vs
 
 
 class DataProcessingService(Service):
@@ -59,17 +61,24 @@ class DataProcessingService(Service):
             match = getattr(run, f"match{index}")
             operation = getattr(run, f"operation{index}")
             if match_type == "regex":
-                value = findall(match, value)
+                regex = vs.get_template(("regex", match), lambda: compile(match))
+                value = regex.findall(value)
             elif "textfsm" in match_type:
-                template = TextFSM(StringIO(match))
+                fsm = vs.get_template(
+                    ("textfsm", match), lambda: TextFSM(StringIO(match))
+                )
+                template = deepcopy(fsm)
                 value = template.ParseText(value)
                 if match_type == "textfsm_dict":
                     value = [dict(zip(template.header, row)) for row in value]
             elif match_type == "jinja2":
-                template = Template(match)
+                template = vs.get_template(("jinja2", match), lambda: Template(match))
                 value = template.render(value)
             elif match_type == "ttp":
-                parser = ttp(data=value, template=match)
+                parser = deepcopy(
+                    vs.get_template(("ttp", match), lambda: ttp(template=match))
+                )
+                parser.add_input(value)
                 parser.parse()
                 value = loads(parser.result(format="json")[0])
             kwargs = {"device": getattr(device, "name", None), "operation": operation}
@@ -15,7 +15,11 @@ class DataValidationService(Service):
     __mapper_args__ = {"polymorphic_identity": "data_validation_service"}
 
     def job(self, run, device=None):
-        return {"query": run.query, "result": run.eval(run.query, **locals())[0]}
+        if run.sandbox:
+            result = run.sandbox_eval(run.query, device=device)[0]
+        else:
+            result = run.eval(run.query, **locals())[0]
+        return {"query": run.query, "result": result}
 
 
 class DataValidationForm(ServiceForm):
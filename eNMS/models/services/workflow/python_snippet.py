@@ -6,6 +6,7 @@ from eNMS.database import db
 from eNMS.forms import ServiceForm
 from eNMS.fields import HiddenField, StringField
 from eNMS.models.automation import Service
+from eNMS.runner import SandboxError
 
 
 class PythonSnippetService(Service):
@@ -37,9 +38,25 @@ class PythonSnippetService(Service):
         }
 
         try:
-            exec(code_object, globals)
+            if run.sandbox:
+                _, variables = run.sandbox_eval(run.source_code, "exec", device)
+                results.update(variables["results"])
+            else:
+                exec(code_object, globals)
         except SystemExit:
             pass
+        except SandboxError as exc:
+            results.update(exc.variables.get("results", {}))
+            run.log("info", f"Execution error(line {exc.line}): {str(exc)}")
+            return {
+                "success": False,
+                "result": {
+                    "step": "execute",
+                    "error": str(exc),
+                    "result": results,
+                    "traceback": exc.traceback,
+                },
+            }
         except Exception as exc:
             line_number = extract_tb(exc.__traceback__)[-1][1]
             run.log("info", f"Execution error(line {line_number}): {str(exc)}")
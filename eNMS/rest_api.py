@@ -1,12 +1,16 @@
 from collections import defaultdict
 from flask_login import current_user
+from json import dumps
+from sqlalchemy import or_
 from threading import Thread
 from traceback import format_exc
 from uuid import getnode
+from werkzeug.exceptions import BadRequest
 
 from eNMS.controller import controller
 from eNMS.database import db
 from eNMS.environment import env
+from eNMS.topology import topology
 from eNMS.variables import vs
 
 
@@ -14,13 +18,17 @@ class RestApi:
     rest_endpoints = {
         "GET": {
             "configuration": "get_configuration",
+            "graph": "get_graph",
             "instance": "get_instance",
             "is_alive": "is_alive",
             "query": "query",
             "result": "get_result",
+            "template_cache": "get_template_cache",
+            "transactions": "get_transaction_metrics",
             "workers": "get_workers",
         },
         "POST": {
+            "bulk_instance": "bulk_update_instance",
             "instance": "update_instance",
             "migrate": "migrate",
             "run_service": "run_service",
@@ -46,12 +54,21 @@ class RestApi:
             self.rest_endpoints["POST"][endpoint] = endpoint
             setattr(self, endpoint, getattr(controller, endpoint))
 
+    def bulk_update_instance(self, instance_type, list_data=None, **data):
+        return controller.bulk_upsert(instance_type, list_data or [data])
+
     def delete_instance(self, instance_type, name):
         return db.delete(instance_type, name=name)
 
     def get_configuration(self, device_name, property="configuration", **_):
         return getattr(db.fetch("device", name=device_name), property)
 
+    def get_graph(self, operation, **kwargs):
+        if operation not in topology.operations:
+            return {"error": f"Unsupported topology operation: '{operation}'."}
+        kwargs["username"] = current_user.name
+        return getattr(topology, operation)(**kwargs)
+
     def get_instance(self, instance_type, name, **_):
         return db.fetch(instance_type, name=name).to_dict(
             relation_names_only=True, exclude=["positions"]
@@ -72,6 +89,63 @@ class RestApi:
                 "result": result.result if result else "No results yet.",
             }
 
+    def stream_results(self, runtime, cursor=0, **kwargs):
+        if not str(cursor).isdigit():
+            raise BadRequest(f"Invalid cursor '{cursor}'")
+        run = db.fetch("run", runtime=runtime)
+        result, device, service = (
+            vs.models[model] for model in ("result", "device", "service")
+        )
+        query = (
+            db.session.query(
+                result.id,
+                result.runtime,
+                result.success,
+                result.result,
+                device.name,
+                service.scoped_name,
+            )
+            .outerjoin(device, result.device_id == device.id)
+            .join(service, result.service_id == service.id)
+            .filter(result.run_id == run.id, result.id > int(cursor))
+        )
+        if kwargs.get("device"):
+            query = query.filter(device.name == kwargs["device"])
+        if kwargs.get("service"):
+            query = query.filter(
+                or_(
+                    service.name == kwargs["service"],
+                    service.scoped_name == kwargs["service"],
+                )
+            )
+        if kwargs.get("success"):
+            query = query.filter(result.success == (kwargs["success"] == "true"))
+        query = query.order_by(result.id).execution_options(stream_results=True)
+
+        def generate_results():
+            try:
+                for row in query.yield_per(db.streaming["chunk_size"]):
+                    id, runtime, success, content, device_name, service_name = row
+                    line = {
+                        "cursor": id,
+                        "runtime": runtime,
+                        "device": device_name,
+                        "service": service_name,
+                        "success": success,
+                        "result": content,
+                    }
+                    yield f"{dumps(line, default=str)}\n"
+            finally:
+                db.session.close()
+
+        return generate_results()
+
+    def get_template_cache(self, **_):
+        return vs.get_template_cache_stats()
+
+    def get_transaction_metrics(self, **_):
+        return db.get_transaction_metrics()
+
     def get_workers(self):
         return env.get_workers()
 
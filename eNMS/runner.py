@@ -1,45 +1,73 @@
+from asyncio import sleep as async_sleep
 from builtins import __dict__ as builtins
 from copy import deepcopy
 from datetime import datetime
 from functools import partial
-from importlib import __import__ as importlib_import
+from gzip import open as open_gzip
+from hashlib import sha256
+from importlib import __import__ as importlib_import, import_module
 from io import BytesIO, StringIO
 from jinja2 import Template
 from json import dump, load, loads
 from json.decoder import JSONDecodeError
+from lxml.etree import iterparse, QName, tostring
+from multiprocessing import get_context, TimeoutError as PoolTimeoutError
 from multiprocessing.pool import ThreadPool
-from napalm import get_network_driver
-from ncclient import manager
-from netmiko import ConnectHandler
 from operator import attrgetter
-from os import getenv
+from os import getenv, remove
+from pathlib import Path
 from paramiko import AutoAddPolicy, RSAKey, SFTPClient, SSHClient
+from queue import Queue
 from re import compile, search
-from requests import post
 from scp import SCPClient
+from shlex import quote
+from sqlalchemy import inspect, or_
 from sys import getsizeof
+from tempfile import NamedTemporaryFile
 from threading import Thread
-from time import sleep
+from time import monotonic, perf_counter, sleep
 from traceback import format_exc
-from types import GeneratorType
-from warnings import warn
+from types import GeneratorType, SimpleNamespace
 from xmltodict import parse
 from xml.parsers.expat import ExpatError
 
-try:
-    from scrapli import Scrapli
-    from scrapli_netconf.driver import NetconfDriver
-except ImportError as exc:
-    warn(f"Couldn't import scrapli module ({exc})")
-
-try:
-    from slack_sdk import WebClient
-except ImportError as exc:
-    warn(f"Couldn't import slack_sdk module ({exc})")
-
 from eNMS.database import db
 from eNMS.environment import env
+from eNMS.matching import DictionaryMatch
+from eNMS.topology import topology
 from eNMS.variables import vs
+from sandbox.sandbox import init_sandbox, run_sandbox, update_payload
+
+
+class ServiceSnapshot:
+    __slots__ = ()
+    _models = {}
+
+    def __init__(self, service):
+        for property in self.__slots__:
+            object.__setattr__(self, property, getattr(service, property))
+
+    def __setattr__(self, property, _):
+        raise AttributeError(f"Service property '{property}' is read-only in a run")
+
+    @classmethod
+    def from_service(cls, service):
+        model = type(service)
+        if model not in cls._models:
+            properties = tuple(column.key for column in inspect(model).column_attrs)
+            cls._models[model] = type(
+                f"{model.__name__}Snapshot",
+                (cls,),
+                {"__slots__": properties, "_properties": frozenset(properties)},
+            )
+        return cls._models[model](service)
+
+
+class SandboxError(Exception):
+    def __init__(self, error, line, traceback, variables=None):
+        super().__init__(error)
+        self.line, self.traceback = line, traceback
+        self.variables = variables or {}
 
 
 class Runner:
@@ -56,6 +84,9 @@ class Runner:
         self.parent_runtime = kwargs.get("parent_runtime")
         self.runtime = self.parent_runtime if self.is_main_run else vs.get_time()
         self.has_result = False
+        self.write_queue = None
+        self.compiled_matches = {}
+        self.file_checksums = {}
         vs.run_instances[self.runtime] = self
         for key, value in kwargs.items():
             setattr(self, key, value)
@@ -72,6 +103,7 @@ class Runner:
         self.creator_dict = {"name": creator.name, "email": creator.email}
         if not self.is_main_run:
             self.path = f"{run.path}>{self.service.id}"
+        self.service_snapshot = ServiceSnapshot.from_service(self.service)
         db.session.commit()
         self.start_run()
         vs.run_instances.pop(self.runtime)
@@ -83,6 +115,9 @@ class Runner:
         if key in self.__dict__:
             return self.__dict__[key]
         elif set(self.__dict__) & {"service_id", "service"}:
+            snapshot = self.__dict__.get("service_snapshot")
+            if snapshot and key in snapshot._properties:
+                return getattr(snapshot, key)
             return getattr(self.service, key)
         else:
             raise AttributeError
@@ -200,6 +235,7 @@ class Runner:
         self.write_state("success", True)
 
     def write_state(self, path, value, method=None):
+        event = {"path": [self.path, *path.split("/")], "value": value}
         if env.redis_queue:
             if isinstance(value, bool):
                 value = str(value)
@@ -220,6 +256,7 @@ class Runner:
                 store[last] += value
             else:
                 store.setdefault(last, []).append(value)
+        env.publish_state(self.parent_runtime, {**event, "method": method})
 
     def start_run(self):
         self.init_state()
@@ -310,6 +347,14 @@ class Runner:
         device = db.fetch("device", id=device_id)
         run = vs.run_instances[runtime]
         results.append(run.get_results(device))
+        try:
+            if db.session.new or db.session.dirty or db.session.deleted:
+                db.session.commit()
+        except Exception:
+            db.session.rollback()
+            run.log("error", f"Failed to commit device changes:\n{format_exc()}")
+        finally:
+            db.session.remove()
 
     def device_iteration(self, device):
         derived_devices = self.compute_devices_from_query(
@@ -426,10 +471,16 @@ class Runner:
                     (device.id, self.runtime, results) for device in non_skipped_targets
                 ]
                 self.log("info", f"Starting a pool of {processes} threads")
-                self.in_process = True
-                with ThreadPool(processes=processes) as pool:
-                    pool.map(self.get_device_result, process_args)
-                self.in_process = False
+                self.in_process, self.write_queue = True, Queue()
+                writer = Thread(target=db.process_write_queue, args=(self.write_queue,))
+                writer.start()
+                try:
+                    with ThreadPool(processes=processes) as pool:
+                        pool.map(self.get_device_result, process_args)
+                finally:
+                    self.write_queue.put(None)
+                    writer.join()
+                    self.in_process, self.write_queue = False, None
             else:
                 results.extend(
                     [
@@ -440,11 +491,16 @@ class Runner:
             for result in results:
                 key = "success" if result["success"] else "failure"
                 summary[key].append(result["device_target"])
-            return {
+            run_result = {
                 "summary": summary,
                 "success": all(result["success"] for result in results if result),
                 "runtime": self.runtime,
             }
+            changes = [result["changed"] for result in results if "changed" in result]
+            if changes:
+                run_result["changed"] = changes.count(True)
+                run_result["unchanged"] = changes.count(False)
+            return run_result
 
     def check_size_before_commit(self, data, data_type):
         column_type = "pickletype" if data_type == "result" else "large_string"
@@ -496,11 +552,14 @@ class Runner:
                     rbac=None,
                 )
             if self.main_run.trigger == "REST API":
-                results["devices"] = {}
-                for result in self.main_run.results:
-                    if not result.device:
-                        continue
-                    results["devices"][result.device.name] = result.result
+                result_model, device_model = vs.models["result"], vs.models["device"]
+                device_results = (
+                    db.session.query(device_model.name, result_model.result)
+                    .join(device_model, result_model.device_id == device_model.id)
+                    .filter(result_model.run_id == self.main_run.id)
+                    .yield_per(db.streaming["chunk_size"])
+                )
+                results["devices"] = dict(device_results)
         else:
             results.pop("payload", None)
         create_failed_results = self.disable_result_creation and not self.success
@@ -508,6 +567,16 @@ class Runner:
         self.check_size_before_commit(results, "result")
         if not self.disable_result_creation or create_failed_results or run_result:
             self.has_result = True
+            self.index_result(results, device)
+            if device:
+                event = {
+                    "device_results": {device.id: results["success"]},
+                    "service": self.service.id,
+                }
+                env.publish_state(self.parent_runtime, event)
+            if device and self.write_queue:
+                self.write_queue.put(("result", {"result": results, **result_kw}))
+                return results
             try:
                 db.factory(
                     "result", result=results, commit=commit, rbac=None, **result_kw
@@ -530,11 +599,11 @@ class Runner:
                 if self.number_of_retries - retries:
                     retry = self.number_of_retries - retries
                     self.log("error", f"RETRY n°{retry}", device)
-                if self.service.preprocessing:
+                if self.preprocessing and self.sandbox:
+                    self.sandbox_eval(self.preprocessing, "exec", device)
+                elif self.preprocessing:
                     try:
-                        self.eval(
-                            self.service.preprocessing, function="exec", **locals()
-                        )
+                        self.eval(self.preprocessing, function="exec", **locals())
                     except SystemExit:
                         pass
                 try:
@@ -546,7 +615,7 @@ class Runner:
                 results = self.convert_result(results)
                 if "success" not in results:
                     results["success"] = True
-                if self.service.postprocessing:
+                if self.postprocessing:
                     if (
                         self.postprocessing_mode == "always"
                         or self.postprocessing_mode == "failure"
@@ -555,9 +624,20 @@ class Runner:
                         and results["success"]
                     ):
                         try:
-                            _, exec_variables = self.eval(
-                                self.service.postprocessing, function="exec", **locals()
-                            )
+                            if self.sandbox:
+                                _, exec_variables = self.sandbox_eval(
+                                    self.postprocessing,
+                                    "exec",
+                                    device,
+                                    results=results,
+                                    retries=retries,
+                                )
+                                results.clear()
+                                results.update(exec_variables["results"])
+                            else:
+                                _, exec_variables = self.eval(
+                                    self.postprocessing, function="exec", **locals()
+                                )
                             if isinstance(exec_variables.get("retries"), int):
                                 retries = exec_variables["retries"]
                         except SystemExit:
@@ -598,9 +678,9 @@ class Runner:
         if self.stop:
             return {"success": False, **results}
         try:
-            if self.service.iteration_values:
+            if self.iteration_values:
                 targets_results = {}
-                targets = self.eval(self.service.iteration_values, **locals())[0]
+                targets = self.eval(self.iteration_values, **locals())[0]
                 if not isinstance(targets, dict):
                     if isinstance(targets, (GeneratorType, map, filter)):
                         targets = list(targets)
@@ -663,6 +743,7 @@ class Runner:
             and (log_level == -1 or severity not in vs.log_levels[log_level:])
         ):
             return
+        device_name = None
         if device:
             device_name = device if isinstance(device, str) else device.name
             log = f"DEVICE {device_name} - {log}"
@@ -678,9 +759,11 @@ class Runner:
                 f"{vs.get_time()} - {severity} - USER {self.creator} -"
                 f" SERVICE {self.service.scoped_name} - {log}"
             )
-            env.log_queue(self.parent_runtime, self.service.id, run_log)
-            if not self.is_main_run:
-                env.log_queue(self.parent_runtime, self.main_run.service.id, run_log)
+            services = {self.service.id, self.main_run.service.id}
+            for service_id in services:
+                env.log_queue(
+                    self.parent_runtime, service_id, run_log, device=device_name
+                )
 
     def build_notification(self, results):
         notification = {
@@ -712,7 +795,10 @@ class Runner:
                     **self.global_variables(),
                 }
                 if self.service.report_jinja2_template:
-                    report = Template(self.service.report).render(variables)
+                    report = vs.get_template(
+                        ("jinja2", self.service.report),
+                        lambda: Template(self.service.report),
+                    ).render(variables)
                 else:
                     report = self.sub(self.service.report, variables)
         except Exception:
@@ -730,52 +816,75 @@ class Runner:
         return report
 
     def notify(self, results, report):
-        self.log("info", f"Sending {self.send_notification_method} notification...")
+        self.log("info", f"Queueing {self.send_notification_method} notification...")
         notification = self.build_notification(results)
-        file_content = deepcopy(notification)
-        if self.include_device_results:
-            file_content["Device Results"] = {}
-            for device in self.target_devices:
-                device_result = db.fetch(
-                    "result",
-                    service_id=self.service.id,
-                    parent_runtime=self.parent_runtime,
-                    device_id=device.id,
-                    allow_none=True,
-                )
-                if device_result:
-                    file_content["Device Results"][device.name] = device_result.result
+        name = f"{self.send_notification_method.capitalize()} notification"
+        name += f" for '{self.service.name}' ({self.runtime})"
         if self.send_notification_method == "mail":
             filename = self.runtime.replace(".", "").replace(":", "")
             status = "PASS" if results["success"] else "FAILED"
-            content = report if self.email_report else vs.dict_to_string(file_content)
             html_report = self.email_report and self.report_format == "html"
-            result = env.send_email(
-                f"{status}: {self.service.name}",
-                content,
-                recipients=self.sub(self.get("mail_recipient"), locals()),
-                reply_to=self.sub(self.get("reply_to"), locals()),
-                filename=f"results-{filename}.{'html' if html_report else 'txt'}",
-                file_content=content,
-                content_type="html" if html_report else "plain",
-            )
+            content = report if self.email_report else vs.dict_to_string(notification)
+            if self.include_device_results and not self.email_report:
+                content += "\nDevice Results: " + "".join(
+                    f"\n\t{device}: {vs.dict_to_string(result, depth=2)}"
+                    for device, result in self.get_device_results()
+                )
+            attachment = NamedTemporaryFile("w", delete=False)
+            try:
+                with attachment:
+                    attachment.write(content)
+                env.queue_notification(
+                    name,
+                    env.send_email,
+                    cleanup=attachment.name,
+                    subject=f"{status}: {self.service.name}",
+                    content=content,
+                    recipients=self.sub(self.get("mail_recipient"), locals()),
+                    reply_to=self.sub(self.get("reply_to"), locals()),
+                    filename=f"results-{filename}.{'html' if html_report else 'txt'}",
+                    file_path=attachment.name,
+                    content_type="html" if html_report else "plain",
+                )
+            except Exception:
+                remove(attachment.name)
+                raise
         elif self.send_notification_method == "slack":
-            result = WebClient(token=getenv("SLACK_TOKEN")).chat_postMessage(
+            slack_client = import_module("slack_sdk").WebClient
+            env.queue_notification(
+                name,
+                slack_client(token=getenv("SLACK_TOKEN")).chat_postMessage,
                 channel=f"#{vs.settings['slack']['channel']}",
                 text=vs.dict_to_string(notification),
             )
         else:
-            result = post(
-                vs.settings["mattermost"]["url"],
+            env.queue_notification(
+                name,
+                env.send_mattermost,
+                url=vs.settings["mattermost"]["url"],
                 verify=vs.settings["mattermost"]["verify_certificate"],
                 json={
                     "channel": vs.settings["mattermost"]["channel"],
                     "text": notification,
                 },
-            ).text
-        results["notification"] = {"success": True, "result": result}
+            )
+        results["notification"] = {"success": True, "result": f"{name} queued"}
         return results
 
+    def get_device_results(self):
+        result, device = vs.models["result"], vs.models["device"]
+        targets = {target.name for target in self.target_devices}
+        query = (
+            db.session.query(device.name, result.result)
+            .join(device, result.device_id == device.id)
+            .filter(
+                result.service_id == self.service.id,
+                result.parent_runtime == self.parent_runtime,
+            )
+            .yield_per(db.streaming["chunk_size"])
+        )
+        return ((name, result) for name, result in query if name in targets)
+
     def get_credentials(self, device, add_secret=True):
         result, credential_type = {}, self.main_run.service.credential_type
         if self.credentials == "object":
@@ -831,7 +940,7 @@ class Runner:
 
     def validate_result(self, section, device):
         if self.validation_method == "text":
-            match = self.sub(self.content_match, locals())
+            match = self.compile_match("content_match", locals())
             str_section = str(section)
             if self.delete_spaces_before_matching:
                 match, str_section = map(self.space_deleter, (match, str_section))
@@ -842,113 +951,250 @@ class Runner:
                 and not self.content_match_regex
             )
         else:
-            match = self.sub(self.dict_match, locals())
+            match = self.compile_match("dict_match", locals())
             success = self.match_dictionary(section, match)
         validation = {"path": self.validation_section, "value": section, "match": match}
         return {"success": success, "validation": validation}
 
-    def match_dictionary(self, result, match, first=True):
+    def compile_match(self, property, variables):
+        template = getattr(self, property)
+        if property not in self.compiled_matches:
+            self.compiled_matches[property] = "{{" not in str(template)
+        if not self.compiled_matches[property]:
+            return self.sub(template, variables)
+        elif property == "dict_match" and "matcher" not in self.compiled_matches:
+            self.compiled_matches["matcher"] = DictionaryMatch(template)
+        return template
+
+    def match_dictionary(self, result, match):
         if self.validation_method == "dict_equal":
             return result == self.dict_match
+        elif match is self.dict_match and "matcher" in self.compiled_matches:
+            return self.compiled_matches["matcher"](result)
         else:
-            copy = deepcopy(match) if first else match
-            if isinstance(result, dict):
-                for k, v in result.items():
-                    if isinstance(copy.get(k), list) and isinstance(v, list):
-                        for item in v:
-                            try:
-                                copy[k].remove(item)
-                            except ValueError:
-                                pass
-                        pop_key = not copy[k]
-                    else:
-                        pop_key = k in copy and copy[k] == v
-                    copy.pop(k) if pop_key else self.match_dictionary(v, copy, False)
-            elif isinstance(result, list):
-                for item in result:
-                    self.match_dictionary(item, copy, False)
-            return not copy
+            return DictionaryMatch(match)(result)
+
+    def rate_limiter(self, rate):
+        next_call = [monotonic()]
+
+        async def throttle():
+            if not rate:
+                return
+            now = monotonic()
+            call_time = max(now, next_call[0])
+            next_call[0] = call_time + 1 / rate
+            await async_sleep(call_time - now)
+
+        return throttle
+
+    def process_xml_reply(self, reply, device=None, convert=True):
+        result = {}
+        if self.store_raw_reply:
+            folder = vs.file_path / vs.automation["netconf"]["reply_folder"]
+            folder.mkdir(parents=True, exist_ok=True)
+            runtime = self.parent_runtime.replace(".", "").replace(":", "")
+            target = device.name if device else self.service.name
+            path = folder / f"{runtime}-{target}.xml.gz"
+            with open_gzip(path, "wt", encoding="utf-8") as file:
+                file.write(reply)
+            result["raw_reply"] = str(path)
+        if self.xpath_selectors:
+            result["result"] = self.extract_xml_subtrees(reply)
+        elif convert:
+            result["result"] = parse(reply)
+        else:
+            result["result"] = result.get("raw_reply", reply)
+        return result
+
+    def extract_xml_subtrees(self, reply):
+        selectors = {}
+        for selector in self.xpath_selectors.splitlines():
+            if selector.strip():
+                anchored = not selector.startswith("//") and selector.startswith("/")
+                path = tuple(filter(None, selector.strip().split("/")))
+                selectors[selector.strip()] = (anchored, path)
+        subtrees, names, matches = {selector: [] for selector in selectors}, [], []
+        for event, element in iterparse(
+            BytesIO(reply.encode("utf-8")), events=("start", "end")
+        ):
+            if event == "start":
+                names.append(QName(element).localname)
+                match = None
+                if not any(matches):
+                    for selector, (anchored, path) in selectors.items():
+                        if tuple(names[-len(path) :]) != path:
+                            continue
+                        if not anchored or len(names) == len(path):
+                            match = selector
+                            break
+                matches.append(match)
+                continue
+            names.pop()
+            match = matches.pop()
+            if match:
+                subtrees[match].append(parse(tostring(element, with_tail=False)))
+            if any(matches):
+                continue
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+        return subtrees
 
     def transfer_file(self, ssh_client, files):
+        transport = ssh_client.get_transport()
+        channels = max(1, min(self.transfer_channels, len(files)))
+        channel_files = [files[index::channels] for index in range(channels)]
+        with ThreadPool(processes=channels) as pool:
+            results = pool.map(partial(self.transfer_files, transport), channel_files)
+        return [transfer for result in results for transfer in result]
+
+    def transfer_files(self, transport, files):
         if self.protocol == "sftp":
-            with SFTPClient.from_transport(
-                ssh_client.get_transport(),
+            client = SFTPClient.from_transport(
+                transport,
                 window_size=self.window_size,
                 max_packet_size=self.max_transfer_size,
-            ) as sftp:
-                sftp.get_channel().settimeout(self.timeout)
-                for source, destination in files:
-                    getattr(sftp, self.direction)(source, destination)
+            )
+            client.get_channel().settimeout(self.timeout)
         else:
-            with SCPClient(
-                ssh_client.get_transport(), socket_timeout=self.timeout
-            ) as scp:
-                for source, destination in files:
-                    getattr(scp, self.direction)(source, destination)
+            client = SCPClient(transport, socket_timeout=self.timeout)
+        with client:
+            return [
+                self.transfer_single_file(transport, client, source, destination)
+                for source, destination in files
+            ]
+
+    def transfer_single_file(self, transport, client, source, destination):
+        local, remote = (
+            (source, destination) if self.direction == "put" else (destination, source)
+        )
+        result = {"source": source, "destination": destination}
+        if self.skip_identical_files and self.identical_files(transport, local, remote):
+            return {**result, "status": "skipped"}
+        start = perf_counter()
+        getattr(client, self.direction)(source, destination)
+        duration = perf_counter() - start
+        size = Path(local).stat().st_size
+        result.update(
+            {
+                "status": "transferred",
+                "size": size,
+                "duration": round(duration, 3),
+                "throughput": f"{size / max(duration, 1e-6) / 2**20:.2f} MB/s",
+            }
+        )
+        if self.verify_checksum:
+            remote_file = self.remote_file_properties(transport, remote)
+            local_checksum = self.file_checksum(local)
+            result["checksum_verified"] = remote_file == (size, local_checksum)
+        return result
 
-    def payload_helper(
-        self,
-        name,
-        value=None,
-        device=None,
-        section=None,
-        operation="__setitem__",
-        allow_none=False,
-        default=None,
-    ):
-        payload = self.payload.setdefault("variables", {})
-        if device:
-            payload = payload.setdefault("devices", {})
-            payload = payload.setdefault(device, {})
-        if section:
-            payload = payload.setdefault(section, {})
-        if value is None:
-            value = default
-        if operation in ("get", "__setitem__", "setdefault"):
-            value = getattr(payload, operation)(name, value)
-        else:
-            getattr(payload[name], operation)(value)
-        if operation == "get" and not allow_none and value is None:
-            raise Exception(f"Payload Editor: {name} not found in {payload}.")
-        else:
-            return value
+    def identical_files(self, transport, local, remote):
+        if not Path(local).is_file():
+            return False
+        remote_file = self.remote_file_properties(transport, remote)
+        if not remote_file or remote_file[0] != Path(local).stat().st_size:
+            return False
+        return remote_file[1] == self.file_checksum(local)
+
+    def file_checksum(self, path):
+        stat = Path(path).stat()
+        key = (str(path), stat.st_size, stat.st_mtime)
+        if key not in self.file_checksums:
+            checksum = sha256()
+            with open(path, "rb") as file:
+                for chunk in iter(partial(file.read, 2**20), b""):
+                    checksum.update(chunk)
+            self.file_checksums[key] = checksum.hexdigest()
+        return self.file_checksums[key]
+
+    def remote_file_properties(self, transport, path):
+        command = f"stat -c %s {quote(path)} && sha256sum {quote(path)}"
+        try:
+            with transport.open_session() as channel:
+                channel.exec_command(command)
+                output = channel.makefile("r").read().decode("utf-8").split()
+                if channel.recv_exit_status() or len(output) < 2:
+                    return
+                return int(output[0]), output[1]
+        except Exception:
+            return
+
+    def payload_helper(self, *args, **kwargs):
+        return update_payload(self.payload, *args, **kwargs)
 
     def get_var(self, *args, **kwargs):
         return self.payload_helper(*args, operation="get", **kwargs)
 
+    def index_result(self, results, device=None):
+        index = vs.run_results.setdefault(self.parent_runtime, {})
+        if index is None:
+            return
+        limit = vs.settings["automation"]["result_index_limit"]
+        if len(index.setdefault("results", [])) >= limit:
+            vs.run_results[self.parent_runtime] = None
+            return
+        position = len(index["results"])
+        index["results"].append(results)
+        workflow = getattr(self.workflow, "name", None)
+        device = getattr(device, "name", None)
+        for property in ("scoped_name", "name"):
+            service_name = getattr(self.service, property)
+            for workflow_key in {workflow, None}:
+                for device_key in {device, None}:
+                    key = (property, service_name, workflow_key, device_key)
+                    index.setdefault(key, []).append(position)
+
     def get_result(self, service_name, device=None, workflow=None, all_matches=False):
-        def filter_run(query, property):
-            query = query.filter(
-                vs.models["result"].service.has(
-                    getattr(vs.models["service"], property) == service_name
+        result_model, service_model = vs.models["result"], vs.models["service"]
+
+        def search_index(runtime):
+            index = vs.run_results[runtime]
+            for property in ("scoped_name", "name"):
+                positions = index.get((property, service_name, workflow, device))
+                if positions:
+                    return [index["results"][position] for position in positions]
+
+        def search_database(runtime):
+            query = (
+                db.session.query(result_model.result, service_model.scoped_name)
+                .join(service_model, result_model.service_id == service_model.id)
+                .filter(
+                    result_model.parent_runtime == runtime,
+                    or_(
+                        service_model.scoped_name == service_name,
+                        service_model.name == service_name,
+                    ),
                 )
+                .order_by(result_model.id)
             )
-            return query.all()
+            if workflow:
+                workflow_model = vs.models["workflow"]
+                query = query.join(
+                    workflow_model, result_model.workflow_id == workflow_model.id
+                ).filter(workflow_model.name == workflow)
+            if device:
+                device_model = vs.models["device"]
+                query = query.join(
+                    device_model, result_model.device_id == device_model.id
+                ).filter(device_model.name == device)
+            results = query.all()
+            scoped_results = [
+                result for result, name in results if name == service_name
+            ]
+            return scoped_results or [result for result, _ in results]
 
         def recursive_search(run):
             if not run:
                 return None
-            query = db.session.query(vs.models["result"]).filter(
-                vs.models["result"].parent_runtime == run.runtime
-            )
-            if workflow:
-                query = query.filter(
-                    vs.models["result"].workflow.has(
-                        vs.models["workflow"].name == workflow
-                    )
-                )
-            if device:
-                query = query.filter(
-                    vs.models["result"].device.has(vs.models["device"].name == device)
-                )
-            results = filter_run(query, "scoped_name") or filter_run(query, "name")
+            if vs.run_results.get(run.runtime):
+                results = search_index(run.runtime)
+            else:
+                results = search_database(run.runtime)
             if not results:
                 return recursive_search(run.restart_run)
             else:
-                if all_matches:
-                    return [result.result for result in results]
-                else:
-                    return results.pop().result
+                return list(results) if all_matches else results[-1]
 
         return recursive_search(self.main_run)
 
@@ -967,6 +1213,9 @@ class Runner:
         kwargs["rbac"] = "edit"
         return getattr(db, func)(model, username=self.creator, **kwargs)
 
+    def topology_operation(self, operation, *args, **kwargs):
+        return getattr(topology, operation)(*args, **kwargs, username=self.creator)
+
     def prepend_filepath(self, value):
         return f"{vs.file_path}{value}"
 
@@ -1013,6 +1262,12 @@ class Runner:
                     "url": vs.server_url,
                 },
                 "set_var": _self.payload_helper,
+                "topology": SimpleNamespace(
+                    **{
+                        operation: partial(_self.topology_operation, operation)
+                        for operation in topology.operations
+                    }
+                ),
                 "user": _self.creator_dict,
                 "workflow": _self.workflow,
             }
@@ -1026,6 +1281,64 @@ class Runner:
         results = builtins[function](query, exec_variables) if query else ""
         return results, exec_variables
 
+    @staticmethod
+    def get_sandbox_pool():
+        with vs.sandbox_lock:
+            if not vs.sandbox_pool:
+                settings = vs.settings["automation"]["sandbox"]
+                restricted = vs.settings["security"]["forbidden_python_libraries"]
+                context = get_context("forkserver")
+                context.set_forkserver_preload(["sandbox.sandbox"])
+                vs.sandbox_pool = context.Pool(
+                    settings["processes"],
+                    initializer=init_sandbox,
+                    initargs=(settings["memory_limit"], restricted),
+                )
+            return vs.sandbox_pool
+
+    def sandbox_variables(self, device=None, **locals):
+        payload = self.make_json_compliant(self.payload)
+        variables = {**payload.get("form", {}), **payload.get("variables", {})}
+        if device and "devices" in payload.get("variables", {}):
+            variables.update(payload["variables"]["devices"].get(device.name, {}))
+        parent_device = self.parent_device or device
+        for name, instance in (("device", device), ("parent_device", parent_device)):
+            if instance:
+                properties = self.make_json_compliant(instance.get_properties())
+                variables[name] = SimpleNamespace(**properties)
+        variables.update(
+            {
+                "devices": [device.name for device in self.target_devices],
+                "payload": payload,
+                "server": {
+                    "ip_address": vs.server_ip,
+                    "name": vs.server,
+                    "url": vs.server_url,
+                },
+                "user": self.creator_dict,
+                **self.make_json_compliant(locals),
+            }
+        )
+        return variables
+
+    def sandbox_eval(self, code, function="eval", device=None, **locals):
+        timeout = vs.settings["automation"]["sandbox"]["timeout"]
+        variables = self.sandbox_variables(device, **locals)
+        task = self.get_sandbox_pool().apply_async(
+            run_sandbox, (code, function, variables, timeout)
+        )
+        try:
+            output = task.get(timeout + 5)
+        except PoolTimeoutError:
+            raise TimeoutError(f"Sandbox did not answer within {timeout}s.")
+        for severity, log in output["logs"]:
+            self.log(severity, log, device)
+        for args, kwargs in output["updates"]:
+            self.payload_helper(*args, **kwargs)
+        if "error" in output:
+            raise SandboxError(**output["error"], variables=output["variables"])
+        return output.get("value"), output["variables"]
+
     def sub(self, input, variables):
         regex = compile("{{(.*?)}}")
         variables["payload"] = self.payload
@@ -1111,7 +1424,7 @@ class Runner:
                 except Exception:
                     error_log = f"Connection to {gateway} failed:\n{format_exc()}"
                     self.log("error", error_log, device)
-        netmiko_connection = ConnectHandler(
+        netmiko_connection = import_module("netmiko").ConnectHandler(
             device_type=driver,
             ip=device.ip_address,
             port=device.port,
@@ -1153,10 +1466,11 @@ class Runner:
         )
         credentials = self.get_credentials(device)
         is_netconf = self.service.type == "scrapli_netconf_service"
-        connection_class, kwargs = NetconfDriver if is_netconf else Scrapli, {}
         if is_netconf:
-            kwargs["strip_namespaces"] = self.strip_namespaces
+            connection_class = import_module("scrapli_netconf.driver").NetconfDriver
+            kwargs = {"strip_namespaces": self.strip_namespaces}
         else:
+            connection_class, kwargs = import_module("scrapli").Scrapli, {}
             platform = device.scrapli_driver if self.driver == "device" else self.driver
             kwargs.update(
                 {
@@ -1199,7 +1513,7 @@ class Runner:
             optional_args = {}
         if "secret" not in optional_args:
             optional_args["secret"] = credentials.pop("secret", None)
-        driver = get_network_driver(
+        driver = import_module("napalm").get_network_driver(
             device.napalm_driver if self.driver == "device" else self.driver
         )
         napalm_connection = driver(
@@ -1228,7 +1542,7 @@ class Runner:
             logger="security",
         )
         credentials = self.get_credentials(device)
-        ncclient_connection = manager.connect(
+        ncclient_connection = import_module("ncclient.manager").connect(
             host=device.ip_address,
             port=830,
             hostkey_verify=False,
@@ -1242,11 +1556,64 @@ class Runner:
         )[self.connection_name] = ncclient_connection
         return ncclient_connection
 
+    def paramiko_connection(self, device):
+        connection = self.get_or_close_connection("paramiko", device.name)
+        if connection:
+            self.log("info", "Using cached Paramiko Connection", device)
+            return connection
+        self.log(
+            "info",
+            "OPENING Paramiko Connection",
+            device,
+            change_log=False,
+            logger="security",
+        )
+        ssh_client = SSHClient()
+        if self.missing_host_key_policy:
+            ssh_client.set_missing_host_key_policy(AutoAddPolicy())
+        if self.load_known_host_keys:
+            ssh_client.load_system_host_keys()
+        credentials = self.get_credentials(device, add_secret=False)
+        ssh_client.connect(device.ip_address, look_for_keys=False, **credentials)
+        connection_name = getattr(self, "connection_name", "default")
+        vs.connections_cache["paramiko"][self.parent_runtime].setdefault(
+            device.name, {}
+        )[connection_name] = ssh_client
+        return ssh_client
+
+    def send_command(self, connection, device, command, **kwargs):
+        if not self.use_command_cache:
+            return connection.send_command(command, **kwargs)
+        if getattr(self, "config_mode", False):
+            self.invalidate_command_cache(device)
+            return connection.send_command(command, **kwargs)
+        connection_name = getattr(self, "connection_name", "default")
+        jump = None
+        if getattr(self, "jump_on_connect", False):
+            jump = (
+                self.sub(self.jump_command, locals()),
+                self.sub(self.jump_username, locals()),
+            )
+        context = (connection_name, jump, getattr(self, "enable_mode", None))
+        key = (command, context, tuple(sorted(kwargs.items())))
+        cache = vs.command_cache[self.parent_runtime].setdefault(device.name, {})
+        timestamp, runtime, output = cache.get(key, (None, None, None))
+        fresh = timestamp and monotonic() - timestamp < self.command_cache_ttl
+        if fresh and runtime != self.runtime:
+            self.log("info", f"Using cached output of '{command}'", device)
+            return deepcopy(output)
+        output = connection.send_command(command, **kwargs)
+        cache[key] = (monotonic(), self.runtime, deepcopy(output))
+        return output
+
+    def invalidate_command_cache(self, device):
+        vs.command_cache[self.parent_runtime].pop(device.name, None)
+
     def get_or_close_connection(self, library, device):
         connection = self.get_connection(library, device)
         if not connection:
             return
-        if self.start_new_connection:
+        if getattr(self, "start_new_connection", False):
             return self.disconnect(library, device, connection)
         if library == "napalm":
             if connection.is_alive():
@@ -1258,6 +1625,12 @@ class Runner:
                 return connection
             else:
                 self.disconnect(library, device, connection)
+        elif library == "paramiko":
+            transport = connection.get_transport()
+            if transport and transport.is_active():
+                return connection
+            else:
+                self.disconnect(library, device, connection)
         else:
             try:
                 if library == "netmiko":
@@ -1274,14 +1647,14 @@ class Runner:
         return cache.get(device, {}).get(connection)
 
     def close_device_connection(self, device):
-        for library in ("netmiko", "napalm", "scrapli", "ncclient"):
+        for library in vs.connections_cache:
             connection = self.get_connection(library, device)
             if connection:
                 self.disconnect(library, device, connection)
 
     def close_remaining_connections(self):
         threads = []
-        for library in ("netmiko", "napalm", "scrapli", "ncclient"):
+        for library in vs.connections_cache:
             device_connections = vs.connections_cache[library][self.parent_runtime]
             for device, connections in list(device_connections.items()):
                 for connection in list(connections.values()):
@@ -1291,7 +1664,7 @@ class Runner:
                     threads.append(thread)
         for thread in threads:
             thread.join()
-        for library in ("netmiko", "napalm", "scrapli", "ncclient"):
+        for library in vs.connections_cache:
             vs.connections_cache[library].pop(self.parent_runtime)
 
     def disconnect(self, library, device, connection):
@@ -1358,6 +1731,17 @@ class Runner:
             strip_command=True,
         )
 
+    def update_configuration(self, device, property, path, content):
+        content_hash = sha256(content.encode("utf-8")).hexdigest()
+        if getattr(device, f"{property}_hash") == content_hash:
+            return False
+        setattr(device, property, content)
+        setattr(device, f"{property}_hash", content_hash)
+        with open(path / property, "w") as file:
+            file.write(content)
+        vs.run_changed_paths[self.parent_runtime].add(path / property)
+        return True
+
     def update_configuration_properties(self, path, property, device):
         try:
             with open(path / "timestamps.json", "r") as file:
@@ -1370,3 +1754,4 @@ class Runner:
         }
         with open(path / "timestamps.json", "w") as file:
             dump(data, file, indent=4)
+        vs.run_changed_paths[self.parent_runtime].add(path / "timestamps.json")
@@ -8,7 +8,9 @@ from flask import (
     render_template,
     render_template_string,
     request,
+    Response,
     send_file,
+    stream_with_context,
     url_for,
     session,
 )
@@ -22,7 +24,7 @@ from os import getenv, remove
 from pathlib import Path
 from tarfile import open as open_tar
 from traceback import format_exc
-from werkzeug.exceptions import Forbidden, NotFound
+from werkzeug.exceptions import BadRequest, Forbidden, NotFound
 
 from eNMS import controller
 from eNMS.database import db
@@ -35,6 +37,7 @@ from eNMS.variables import vs
 class Server(Flask):
     status_log_level = {
         200: "info",
+        400: "warning",
         401: "warning",
         403: "warning",
         404: "info",
@@ -42,6 +45,7 @@ class Server(Flask):
     }
 
     status_error_message = {
+        400: "Bad Request.",
         401: "Wrong Credentials.",
         403: "Not Authorized.",
         404: "Not Found.",
@@ -156,6 +160,8 @@ class Server(Flask):
                 try:
                     result = function(*args, **kwargs)
                     status_code = 200
+                except BadRequest:
+                    status_code = 400
                 except (db.rbac_error, Forbidden):
                     status_code = 403
                 except NotFound:
@@ -315,11 +321,34 @@ class Server(Flask):
         @blueprint.route("/view_service_results/<int:run_id>/<int:service>")
         @self.process_requests
         def view_service_results(run_id, service):
-            results = db.fetch_all("result", run_id=run_id, service_id=service)
-            results_dict = [result.result for result in results]
-            if not results_dict:
+            query = db.query("result").filter_by(run_id=run_id, service_id=service)
+            if not query.with_entities(vs.models["result"].id).first():
                 return "No Results Found"
-            return f"<pre>{vs.dict_to_string(results_dict)}</pre>"
+            results = (
+                query.with_entities(vs.models["result"].result)
+                .order_by(vs.models["result"].id)
+                .execution_options(stream_results=True)
+                .yield_per(db.streaming["chunk_size"])
+            )
+
+            def stream_results():
+                yield "<pre>\n"
+                for (result,) in results:
+                    yield f"- {vs.dict_to_string(result, depth=1)}\n"
+                yield "</pre>"
+
+            return Response(stream_with_context(stream_results()))
+
+        @blueprint.route("/stream_<type>_state/<path:path>")
+        @self.process_requests
+        def stream_state(type, path):
+            kwargs = request.args.to_dict()
+            events = controller.stream_state(type, path, **kwargs)
+            return Response(
+                stream_with_context(events),
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+                mimetype="text/event-stream",
+            )
 
         @blueprint.route("/download/<type>/<path:path>")
         @self.process_requests
@@ -358,6 +387,15 @@ class Server(Flask):
         def get_requests_sink(_):
             abort(404)
 
+        @blueprint.route("/rest/results/<runtime>")
+        @self.process_requests
+        def stream_results(runtime):
+            kwargs = request.args.to_dict()
+            results = self.rest_api.stream_results(runtime, **kwargs)
+            return Response(
+                stream_with_context(results), mimetype="application/x-ndjson"
+            )
+
         @blueprint.route("/rest/<path:page>", methods=["DELETE", "GET", "POST"])
         @self.process_requests
         @self.csrf.exempt
@@ -293,7 +293,9 @@ export const showRuntimePanel = function(
   call({
     url: `/get_runtimes/${service.id}`,
     callback: (runtimes) => {
-      if (newRuntime) runtimes.push([runtime, runtime]);
+      const listed = runtimes.some((entry) => entry[0] == runtime);
+      const savedRuntime = runtime && !["normal", "latest"].includes(runtime);
+      if (newRuntime || (savedRuntime && !listed)) runtimes.push([runtime, runtime]);
       if (!runtimes.length) return notify(`No ${type} yet.`, "error", 5);
       let content;
       if (panelType == "logs" || panelType == "report") {
@@ -415,8 +417,10 @@ export const showRuntimePanel = function(
             runtime = runtimes[0][0];
           }
           $(`#runtimes-${panelId}`)
+            .selectpicker({ liveSearch: true })
             .val(runtime)
             .selectpicker("refresh");
+          bindRuntimeSearch(`#runtimes-${panelId}`, () => ({ id: service.id }));
           $(`#runtimes-${panelId}`).on("change", function() {
             displayFunction(service, this.value, true, table, true, fullResult);
           });
@@ -427,6 +431,37 @@ export const showRuntimePanel = function(
   });
 };
 
+export function bindRuntimeSearch(select, query, keptRuntimes = []) {
+  let searchTimer = false;
+  $(select)
+    .parent()
+    .on("keyup", ".bs-searchbox input", function() {
+      const search = this.value;
+      if (searchTimer) clearTimeout(searchTimer);
+      searchTimer = setTimeout(() => searchRuntimes(search), 300);
+    });
+
+  function searchRuntimes(search) {
+    const { id, ...data } = query();
+    call({
+      url: `/get_runtimes/${id}`,
+      data: { ...data, search: search },
+      callback: function(runtimes) {
+        const kept = [...keptRuntimes, $(select).val()];
+        $(select)
+          .find("option")
+          .filter((_, option) => !kept.includes(option.value))
+          .remove();
+        runtimes.forEach((runtime) => {
+          if (kept.includes(runtime[0])) return;
+          $(select).append(new Option(runtime[1], runtime[0]));
+        });
+        $(select).selectpicker("refresh");
+      },
+    });
+  }
+}
+
 function displayReport(service, runtime, change) {
   let editor;
   const id = `service-report-${service.id}`;
@@ -577,25 +612,35 @@ function displayResultsTable(service, runtime, _, type, refresh, fullResult) {
   }
 }
 
-function refreshLogs(service, runtime, editor, first, wasRefreshed, line) {
+function refreshLogs(service, runtime, editor, first, wasRefreshed, line, cursor) {
   if (!$(`#service-logs-${service.id}`).length) return;
   if (runtime != $(`#runtimes-logs-${service.id}`).val()) return;
+  const device = $("#device-filter").val() || "";
+  const reset = !first && device != cursor;
   call({
     url: `/get_service_logs/${service.id}/${runtime}`,
-    data: { line: line || 0, device: $("#device-filter").val() },
+    data: { line: reset ? 0 : line || 0, device: device },
     callback: function(result) {
-      if (!first && result.refresh && result.logs.length) {
+      if (!first && !reset && result.refresh && result.logs.length) {
         // eslint-disable-next-line new-cap
         editor.replaceRange(`\n${result.logs}`, CodeMirror.Pos(editor.lineCount()));
         editor.setCursor(editor.lineCount(), 0);
-      } else if (first || !result.refresh) {
+      } else if (first || reset || !result.refresh) {
         editor.setValue(`Gathering logs for '${service.name}'...\n\n${result.logs}`);
         editor.refresh();
       }
       if (first || result.refresh) {
         setTimeout(
           () =>
-            refreshLogs(service, runtime, editor, false, result.refresh, result.line),
+            refreshLogs(
+              service,
+              runtime,
+              editor,
+              false,
+              result.refresh,
+              result.line,
+              device
+            ),
           automation.workflow.logs_refresh_rate
         );
       } else if (wasRefreshed) {
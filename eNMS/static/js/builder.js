@@ -36,6 +36,7 @@ import {
   ends,
   flipRuntimeDisplay,
   getWorkflowState,
+  initRuntimeSearch,
   resetWorkflowDisplay,
   switchToWorkflow,
   updateWorkflowRightClickBindings,
@@ -569,7 +570,7 @@ export function initBuilder() {
           notify(`No ${type} has been created yet.`, "error", 5);
         }
       }
-      $(`#current-${type},#current-runtimes`).selectpicker({ liveSearch: true });
+      $(`#current-${type},#current-runtime`).selectpicker({ liveSearch: true });
       let searchTimer = false;
       $(`#${type}-search`).keyup(function() {
         if (searchTimer) clearTimeout(searchTimer);
@@ -580,6 +581,7 @@ export function initBuilder() {
         $("#current-runtime,#device-filter").on("change", function() {
           getWorkflowState();
         });
+        initRuntimeSearch();
         getWorkflowState(true, true);
       } else {
         getNetworkState(true, true);
@@ -40,6 +40,8 @@ const displayImage = visualization["Network Builder"].display_nodes_as_images;
 
 let graph;
 let parallelLinks = {};
+let pollState;
+let stateSource;
 export let network = JSON.parse(localStorage.getItem("network"));
 
 const options = {
@@ -80,6 +82,7 @@ export function switchToNetwork(path, direction) {
       if (network) localStorage.setItem("network", JSON.stringify(network));
       displayNetwork(network);
       switchMode(currentMode, true);
+      if (stateSource) subscribeNetworkState();
     },
   });
 }
@@ -251,27 +254,52 @@ export function updateNetworkRightClickBindings() {
 
 function displayNetworkState(results) {
   nodes.update(
-    Object.entries(results).map(([nodeId, success]) => {
-      const color = success ? "green" : "red";
-      const icon = nodes.get(parseInt(nodeId)).icon;
-      const image = `/static/img/network/${color}/${icon}.gif`;
-      return { id: parseInt(nodeId), image: image };
-    })
+    Object.entries(results)
+      .filter(([nodeId]) => nodes.get(parseInt(nodeId)))
+      .map(([nodeId, success]) => {
+        const color = success ? "green" : "red";
+        const icon = nodes.get(parseInt(nodeId)).icon;
+        const image = `/static/img/network/${color}/${icon}.gif`;
+        return { id: parseInt(nodeId), image: image };
+      })
   );
 }
 
+function processNetworkState(result) {
+  if (result.network.last_modified > instance.last_modified) {
+    instance.last_modified = result.network.last_modified;
+    displayNetwork(result.network);
+  }
+  if (result.device_results) displayNetworkState(result.device_results);
+}
+
+function subscribeNetworkState() {
+  if (stateSource) stateSource.close();
+  if (!network?.id) return;
+  const parameters = $.param({ runtime: network.runtime || "" });
+  stateSource = new EventSource(`/stream_network_state/${currentPath}?${parameters}`);
+  stateSource.addEventListener("state", function(event) {
+    processNetworkState(JSON.parse(event.data));
+  });
+  stateSource.addEventListener("delta", function(event) {
+    const delta = JSON.parse(event.data);
+    if (delta.device_results) displayNetworkState(delta.device_results);
+  });
+  stateSource.addEventListener("fallback", function() {
+    stateSource.close();
+    stateSource = null;
+    pollState = true;
+    getNetworkState(true, false);
+  });
+}
+
 export function getNetworkState(periodic, first) {
+  if (!pollState && (periodic || stateSource)) return subscribeNetworkState();
   if (userIsActive && network?.id && !first) {
     call({
       url: `/get_network_state/${currentPath}`,
       data: { runtime: network.runtime },
-      callback: function(result) {
-        if (result.network.last_modified > instance.last_modified) {
-          instance.last_modified = result.network.last_modified;
-          displayNetwork(result.network);
-        }
-        if (result.device_results) displayNetworkState(result.device_results);
-      },
+      callback: processNetworkState,
     });
   }
   if (periodic) setTimeout(() => getNetworkState(true, false), 4000);
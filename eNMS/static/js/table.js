@@ -1823,13 +1823,36 @@ function showBulkEditPanel(formId, model, tableId, number) {
   });
 }
 
+function trackJob(job, callback, progress) {
+  call({
+    url: `/get_job/${job.id}`,
+    callback: function(state) {
+      if (!state) {
+        notify("The job could not be found.", "error", 5);
+      } else if (state.status == "Running") {
+        if (state.progress != progress) {
+          const message = `${state.name}: ${state.progress}/${state.total} items.`;
+          notify(message, "info", 5);
+        }
+        setTimeout(() => trackJob(job, callback, state.progress), 3000);
+      } else if (state.status == "Failed") {
+        notify(`${state.name} failed (see logs).`, "error", 5, true);
+      } else {
+        callback(state.result);
+      }
+    },
+  });
+}
+
 function bulkDeletion(tableId, model) {
   call({
     url: `/bulk_deletion/${model}`,
     data: tableInstances[tableId].getFilteringData(),
-    callback: function(number) {
-      refreshTable(tableId, false, true);
-      notify(`${number} items deleted.`, "success", 5, true);
+    callback: function(job) {
+      trackJob(job, function(number) {
+        refreshTable(tableId, false, true);
+        notify(`${number} items deleted.`, "success", 5, true);
+      });
     },
   });
 }
@@ -1855,10 +1878,12 @@ function bulkEdit(formId, model, tableId) {
   call({
     url: `/bulk_edit/${model}`,
     form: `${formId}-form-${tableId}`,
-    callback: function(number) {
-      refreshTable(tableId);
+    callback: function(job) {
       $(`#${formId}-${tableId}`).remove();
-      notify(`${number} items modified.`, "success", 5, true);
+      trackJob(job, function(number) {
+        refreshTable(tableId);
+        notify(`${number} items modified.`, "success", 5, true);
+      });
     },
   });
 }
@@ -27,12 +27,15 @@ import { tables } from "./table.js";
 
 let selectedObject;
 let markersArray = [];
+let clusterMarkers = [];
 let polylinesObjects = {};
 let layer;
 let markerType;
 let map;
 let markerGroup;
 let clustered;
+let serverClustered;
+let moveTimer = false;
 let devicesProperties = {};
 let linksProperties = {};
 let routerIcon;
@@ -50,6 +53,7 @@ function updateRightClickBindings(controls) {
     "Circle Marker": () => changeMarker("Circle Marker"),
     Normal: () => displayNetwork({}),
     Clustered: () => displayNetwork({ withCluster: true }),
+    "Server Clustering": () => displayNetwork({ withServerCluster: true }),
     Backward: () => displayNetwork({ direction: "left" }),
     Forward: () => displayNetwork({ direction: "right" }),
   });
@@ -74,6 +78,11 @@ function initLeaflet() {
         $(".menu").hide();
         $(".geo-menu").show();
       }
+    })
+    .on("moveend", function() {
+      if (!serverClustered) return;
+      if (moveTimer) clearTimeout(moveTimer);
+      moveTimer = setTimeout(() => displaySpatialView(true), 300);
     });
   for (const [key, value] of Object.entries(settings.icons)) {
     window[`icon_${key}`] = L.icon({
@@ -136,6 +145,23 @@ function createNode(node) {
   }
 }
 
+function createCluster(cluster) {
+  const size =
+    cluster.count < 100 ? "small" : cluster.count < 1000 ? "medium" : "large";
+  const marker = L.marker([cluster.latitude, cluster.longitude], {
+    icon: L.divIcon({
+      html: `<div><span>${cluster.count}</span></div>`,
+      className: `marker-cluster marker-cluster-${size}`,
+      iconSize: L.point(40, 40),
+    }),
+  });
+  marker.on("click", function() {
+    map.setView([cluster.latitude, cluster.longitude], map.getZoom() + 2);
+  });
+  clusterMarkers.push(marker);
+  marker.addTo(map);
+}
+
 function createLink(link) {
   if (clustered || !link.destination_id || !link.source_id) return;
   linksProperties[link.id] = link;
@@ -177,6 +203,8 @@ function deleteAllDevices() {
     }
   }
   markersArray = [];
+  for (const marker of clusterMarkers) marker.removeFrom(map);
+  clusterMarkers = [];
 }
 
 function deleteAllLinks() {
@@ -252,9 +280,48 @@ function processNetwork(network) {
   network.links = network.links.filter((link) => !parallelLinks.has(link.id));
 }
 
-function displayNetwork({ direction, noAlert, withCluster } = {}) {
-  if (page == "view_builder") return;
+function getFilteringData() {
   let data = {};
+  for (let type of ["device", "link"]) {
+    let form = serializeForm(`#${type}_filtering-form`, `${type}_filtering`, true);
+    if (currentPath) form.intersect = { type: "pool", id: currentPath };
+    data[type] = { form: form };
+  }
+  return data;
+}
+
+function displaySpatialView(noAlert) {
+  const zoom = map.getZoom();
+  const tile = 360 / 2 ** zoom;
+  const bounds = map.getBounds();
+  const snap = (value, round) => Math[round](value / tile) * tile;
+  const data = {
+    ...getFilteringData(),
+    zoom: zoom,
+    bounds: {
+      south: Math.max(snap(bounds.getSouth(), "floor"), -90),
+      west: Math.max(snap(bounds.getWest(), "floor"), -180),
+      north: Math.min(snap(bounds.getNorth(), "ceil"), 90),
+      east: Math.min(snap(bounds.getEast(), "ceil"), 180),
+    },
+  };
+  call({
+    url: "/view_filtering",
+    data: data,
+    callback: function(view) {
+      deleteAll();
+      processNetwork(view);
+      view.clusters.map(createCluster);
+      view.devices.map(createNode);
+      view.links.map(createLink);
+      map.removeLayer(markerGroup);
+      if (!noAlert) notify("Filter applied.", "success", 5);
+    },
+  });
+}
+
+function displayNetwork({ direction, noAlert, withCluster, withServerCluster } = {}) {
+  if (page == "view_builder") return;
   currentPath =
     direction == "left"
       ? history[historyPosition - 1]
@@ -272,16 +339,13 @@ function displayNetwork({ direction, noAlert, withCluster } = {}) {
   $("#current-pool")
     .val(currentPath)
     .selectpicker("refresh");
-  for (let type of ["device", "link"]) {
-    let form = serializeForm(`#${type}_filtering-form`, `${type}_filtering`, true);
-    if (currentPath) form.intersect = { type: "pool", id: currentPath };
-    data[type] = { form: form };
-  }
-  deleteAll();
   clustered = withCluster;
+  serverClustered = withServerCluster;
+  if (serverClustered) return displaySpatialView(noAlert);
+  deleteAll();
   call({
     url: "/view_filtering",
-    data: data,
+    data: getFilteringData(),
     callback: function(network) {
       processNetwork(network);
       network.devices.map(createNode);
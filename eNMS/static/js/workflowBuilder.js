@@ -9,7 +9,13 @@ theme: false
 user: false
 */
 
-import { field, runService, runLogic, showRuntimePanel } from "./automation.js";
+import {
+  bindRuntimeSearch,
+  field,
+  runService,
+  runLogic,
+  showRuntimePanel,
+} from "./automation.js";
 import {
   call,
   configureNamespace,
@@ -72,6 +78,9 @@ export let graph;
 
 let currentRun;
 let currentPlaceholder;
+let liveState;
+let pollState;
+let stateSource;
 let placeholder;
 let isSuperworkflow;
 let runtimeDisplay;
@@ -145,6 +154,14 @@ function updateRuntimes(result) {
   $("#current-runtime").selectpicker("refresh");
 }
 
+export function initRuntimeSearch() {
+  bindRuntimeSearch(
+    "#current-runtime",
+    () => ({ id: workflow.id, display: runtimeDisplay }),
+    ["normal", "latest"]
+  );
+}
+
 export function flipRuntimeDisplay(display) {
   runtimeDisplay = display || (runtimeDisplay == "users" ? "user" : "users");
   runtimeDisplayFlip = true;
@@ -230,6 +247,7 @@ export const switchToWorkflow = function(path, direction, runtime, selection) {
       displayWorkflow(result);
       if (selection) graph.setSelection(selection);
       switchMode(currentMode, true);
+      if (stateSource) subscribeWorkflowState();
     },
   });
 };
@@ -702,26 +720,76 @@ export function resetWorkflowDisplay() {
   }
 }
 
+function processWorkflowState(result) {
+  if (!Object.keys(result).length || result.service.id != workflow.id) return;
+  currentRun = result.run;
+  currentRuntime = result.runtime;
+  if (result.service.last_modified > instance.last_modified) {
+    displayWorkflow(result);
+  } else {
+    displayWorkflowState(result);
+  }
+}
+
+function applyStateDelta(delta) {
+  if (delta.device_results) {
+    const deviceId = $("#device-filter").val();
+    const success = delta.device_results[deviceId];
+    if (liveState.device_state && success !== undefined) {
+      liveState.device_state[delta.service] = success;
+    }
+    return;
+  }
+  if (!liveState.state) liveState.state = {};
+  let store = liveState.state;
+  const last = delta.path.pop();
+  for (const key of delta.path) store = store[key] = store[key] || {};
+  if (!delta.method) {
+    store[last] = delta.value;
+  } else if (delta.method == "increment") {
+    store[last] = (parseInt(store[last]) || 0) + delta.value;
+  } else {
+    store[last] = [...(store[last] || []), delta.value];
+  }
+}
+
+function subscribeWorkflowState() {
+  if (stateSource) stateSource.close();
+  if (!workflow?.id) return;
+  const parameters = $.param({
+    display: runtimeDisplay,
+    runtime: $("#current-runtime").val() || currentRuntime || "latest",
+    device: $("#device-filter").val() || "",
+  });
+  stateSource = new EventSource(`/stream_service_state/${currentPath}?${parameters}`);
+  stateSource.addEventListener("state", function(event) {
+    liveState = JSON.parse(event.data);
+    processWorkflowState(liveState);
+  });
+  stateSource.addEventListener("delta", function(event) {
+    if (!liveState) return;
+    applyStateDelta(JSON.parse(event.data));
+    if (userIsActive) displayWorkflowState(liveState);
+  });
+  stateSource.addEventListener("fallback", function() {
+    stateSource.close();
+    stateSource = null;
+    pollState = true;
+    getWorkflowState(true, false);
+  });
+}
+
 export function getWorkflowState(periodic, first) {
-  const runtime = $("#current-runtime").val();
+  if (!pollState && (periodic || stateSource)) return subscribeWorkflowState();
   if (userIsActive && workflow?.id && !first) {
     call({
       url: `/get_service_state/${currentPath}`,
       data: {
         display: runtimeDisplay,
-        runtime: runtime,
+        runtime: $("#current-runtime").val(),
         device: $("#device-filter").val(),
       },
-      callback: function(result) {
-        if (!Object.keys(result).length || result.service.id != workflow.id) return;
-        currentRun = result.run;
-        currentRuntime = result.runtime;
-        if (result.service.last_modified > instance.last_modified) {
-          displayWorkflow(result);
-        } else {
-          displayWorkflowState(result);
-        }
-      },
+      callback: processWorkflowState,
     });
   }
   if (periodic) setTimeout(() => getWorkflowState(true, false), 4000);
@@ -0,0 +1,214 @@
+from collections import defaultdict, deque
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import object_session, Session
+from threading import RLock
+from werkzeug.exceptions import NotFound
+
+from eNMS.database import db
+from eNMS.environment import env
+from eNMS.variables import vs
+
+
+class Topology:
+    operations = ("components", "k_hop", "neighbors", "shortest_path")
+
+    def __init__(self):
+        self.lock = RLock()
+        self.version = None
+        self.configure_session_events()
+
+    def configure_session_events(self):
+        @event.listens_for(Session, "after_commit")
+        def apply_changes(session):
+            changes = session.info.get("topology", {})
+            savepoint = session.get_nested_transaction()
+            if savepoint:
+                savepoint_changes = changes.pop(savepoint, [])
+                changes.setdefault(savepoint.parent, []).extend(savepoint_changes)
+            elif changes.get(session.get_transaction()):
+                self.apply(changes.pop(session.get_transaction()))
+
+        @event.listens_for(Session, "after_transaction_end")
+        def discard_changes(session, transaction):
+            session.info.get("topology", {}).pop(transaction, None)
+
+    def configure_model_events(self, model, *properties):
+        @event.listens_for(model, "after_insert", propagate=True)
+        def topology_creation(mapper, connection, target):
+            self.record(target)
+
+        @event.listens_for(model, "after_update", propagate=True)
+        def topology_update(mapper, connection, target):
+            state = inspect(target)
+            if any(state.attrs[key].history.has_changes() for key in properties):
+                self.record(target)
+
+        @event.listens_for(model, "after_delete", propagate=True)
+        def topology_deletion(mapper, connection, target):
+            self.record(target, deletion=True)
+
+    def record(self, target, deletion=False):
+        if target.class_type == "link":
+            endpoints = (
+                (None, None) if deletion else (target.source_id, target.destination_id)
+            )
+            change = ("link", target.id, *endpoints)
+        else:
+            change = ("device", target.id, None if deletion else target.name)
+        session = object_session(target)
+        transaction = session.get_nested_transaction() or session.get_transaction()
+        changes = session.info.setdefault("topology", {})
+        changes.setdefault(transaction, []).append(change)
+
+    def apply(self, changes):
+        with self.lock:
+            version = env.redis("incr", "topology/version") if env.redis_queue else 0
+            if self.version is None:
+                return
+            elif version and version != self.version + 1:
+                self.version = None
+                return
+            for model, *change in changes:
+                getattr(self, f"update_{model}")(*change)
+            self.version = version
+
+    def reset(self):
+        with self.lock:
+            if env.redis_queue:
+                env.redis("incr", "topology/version")
+            self.version = None
+
+    def build(self, version):
+        device, link = vs.models["device"], vs.models["link"]
+        self.names, self.ids, self.links = {}, {}, {}
+        self.adjacency = {"source": defaultdict(dict), "destination": defaultdict(dict)}
+        for device_id, name in db.session.query(device.id, device.name):
+            self.update_device(device_id, name)
+        link_query = db.session.query(link.id, link.source_id, link.destination_id)
+        for link_id, source_id, destination_id in link_query:
+            self.update_link(link_id, source_id, destination_id)
+        self.version = version
+
+    def update_device(self, device_id, name):
+        self.ids.pop(self.names.pop(device_id, None), None)
+        if name is None:
+            for link_id in self.edges(device_id):
+                self.update_link(link_id, None, None)
+            for direction in ("source", "destination"):
+                self.adjacency[direction].pop(device_id, None)
+        else:
+            self.names[device_id], self.ids[name] = name, device_id
+
+    def update_link(self, link_id, source_id, destination_id):
+        if link_id in self.links:
+            old_source, old_destination = self.links.pop(link_id)
+            self.adjacency["source"][old_source].pop(link_id, None)
+            self.adjacency["destination"][old_destination].pop(link_id, None)
+        if source_id is None or destination_id is None:
+            return
+        self.links[link_id] = (source_id, destination_id)
+        self.adjacency["source"][source_id][link_id] = destination_id
+        self.adjacency["destination"][destination_id][link_id] = source_id
+
+    def refresh(self):
+        if env.redis_queue:
+            version = int(env.redis("get", "topology/version") or 0)
+        else:
+            version = 0
+        if self.version != version:
+            self.build(version)
+
+    def device_id(self, device, device_ids):
+        if isinstance(device, str):
+            device = self.ids.get(device)
+        else:
+            device = getattr(device, "id", device)
+        if device not in device_ids:
+            raise NotFound("The device could not be found in the topology.")
+        return device
+
+    def device_ids(self, username):
+        query = db.query("device", properties=["id"], username=username)
+        return {device_id for device_id, in query} if query else set()
+
+    def edges(self, device_id, direction="both"):
+        edges = {}
+        for edge_direction in ("source", "destination"):
+            if direction in ("both", edge_direction):
+                edges.update(self.adjacency[edge_direction].get(device_id, {}))
+        return edges
+
+    def adjacent(self, device_id, direction="both"):
+        with self.lock:
+            self.refresh()
+            return self.edges(device_id, direction)
+
+    def traverse(self, source_id, device_ids, direction="both", **kwargs):
+        depth, target_id = kwargs.get("depth"), kwargs.get("target_id")
+        parents, queue = {source_id: None}, deque([(source_id, 0)])
+        while queue:
+            device_id, distance = queue.popleft()
+            if device_id == target_id or distance == depth:
+                continue
+            for neighbor_id in self.edges(device_id, direction).values():
+                if neighbor_id in device_ids and neighbor_id not in parents:
+                    parents[neighbor_id] = device_id
+                    queue.append((neighbor_id, distance + 1))
+        return parents
+
+    def neighbors(self, device, direction="both", username=None):
+        device_ids = self.device_ids(username)
+        with self.lock:
+            self.refresh()
+            edges = self.edges(self.device_id(device, device_ids), direction)
+            return sorted(
+                {
+                    self.names[neighbor_id]
+                    for neighbor_id in edges.values()
+                    if neighbor_id in device_ids
+                }
+            )
+
+    def k_hop(self, device, depth=1, direction="both", username=None):
+        device_ids = self.device_ids(username)
+        with self.lock:
+            self.refresh()
+            source_id, distances = self.device_id(device, device_ids), {}
+            parents = self.traverse(source_id, device_ids, direction, depth=int(depth))
+            for device_id, parent_id in parents.items():
+                if parent_id is not None:
+                    distances[device_id] = distances.get(parent_id, 0) + 1
+            return {
+                self.names[device_id]: hops for device_id, hops in distances.items()
+            }
+
+    def shortest_path(self, source, destination, direction="both", username=None):
+        device_ids = self.device_ids(username)
+        with self.lock:
+            self.refresh()
+            source_id = self.device_id(source, device_ids)
+            target_id = self.device_id(destination, device_ids)
+            kwargs = {"direction": direction, "target_id": target_id}
+            parents = self.traverse(source_id, device_ids, **kwargs)
+            if target_id not in parents:
+                return None
+            path = [target_id]
+            while parents[path[-1]] is not None:
+                path.append(parents[path[-1]])
+            return [self.names[device_id] for device_id in reversed(path)]
+
+    def components(self, username=None):
+        device_ids = self.device_ids(username)
+        with self.lock:
+            self.refresh()
+            components, visited = [], set()
+            for device_id in self.names:
+                if device_id in visited or device_id not in device_ids:
+                    continue
+                component = self.traverse(device_id, device_ids)
+                visited |= component.keys()
+                components.append(sorted(self.names[node] for node in component))
+            return sorted(components, key=len, reverse=True)
+
+
+topology = Topology()
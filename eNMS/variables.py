@@ -1,11 +1,12 @@
-from collections import defaultdict
+from collections import Counter, defaultdict, OrderedDict
+from contextlib import contextmanager
 from datetime import datetime
 from git import Repo
-from json import load
-from logging import error
-from napalm._SUPPORTED_DRIVERS import SUPPORTED_DRIVERS
-from ncclient.devices import supported_devices_cfg
-from netmiko.ssh_dispatcher import CLASS_MAPPER
+from hashlib import sha1
+from importlib import import_module
+from importlib.metadata import PackageNotFoundError, version
+from json import dump, load
+from logging import error, info
 from os import getenv
 from pathlib import Path
 from string import punctuation
@@ -15,18 +16,13 @@ from warnings import warn
 from wtforms.validators import __all__ as all_validators
 from wtforms.widgets.core import __all__ as all_widgets
 from textwrap import indent
-
-try:
-    from scrapli import Scrapli
-
-    CORE_PLATFORM_MAP = {driver: driver for driver in Scrapli.CORE_PLATFORM_MAP}
-except ImportError as exc:
-    CORE_PLATFORM_MAP = {"cisco_iosxe": "cisco_iosxe"}
-    warn(f"Couldn't import scrapli module ({exc})")
+from threading import Lock, Semaphore
+from time import monotonic, perf_counter
 
 
 class VariableStore:
     def __init__(self):
+        self.startup_profile = {}
         self._set_setup_variables()
         self._set_server_variables()
         self._set_automation_variables()
@@ -53,6 +49,7 @@ class VariableStore:
         self.migration_path = (
             self.settings["paths"]["migration"] or f"{self.file_path}/migrations"
         )
+        self.cache_path = Path(self.settings["paths"]["cache"] or self.path / "cache")
 
     def _set_server_variables(self):
         self.server = getenv("SERVER_NAME", "Localhost")
@@ -67,10 +64,10 @@ class VariableStore:
 
     def _set_automation_variables(self):
         self.ssh_sessions = {}
-        self.netmiko_drivers = sorted(self.dualize(CLASS_MAPPER))
-        self.napalm_drivers = sorted(self.dualize(SUPPORTED_DRIVERS[1:]))
-        self.netconf_drivers = sorted(self.dualize(supported_devices_cfg))
-        self.scrapli_drivers = sorted(self.dualize(CORE_PLATFORM_MAP))
+        with self.profile_startup("driver registry"):
+            for library, drivers in self.get_driver_registry().items():
+                drivers = [tuple(driver) for driver in drivers]
+                setattr(self, f"{library}_drivers", drivers)
         self.timestamps = ("status", "update", "failure", "runtime", "duration")
         self.configuration_properties = {
             "configuration": "Configuration",
@@ -147,23 +144,36 @@ class VariableStore:
                         self.rbac["pages"].append(subpage)
 
     def _set_report_variables(self):
-        self.reports = {"Empty report": ""}
+        self.reports = {"Empty report": None}
         for path in Path(self.file_path / "reports").glob("**/*"):
             if path.suffix not in {".j2", ".txt"}:
                 continue
-            with open(path, "r") as file:
-                self.reports[path.name] = file.read()
+            self.reports[path.name] = path
 
     def _set_run_variables(self):
         self.run_targets = {}
         self.run_services = defaultdict(set)
+        self.run_changed_paths = defaultdict(set)
+        self.command_cache = defaultdict(dict)
+        self.run_results = {}
         self.run_states = defaultdict(dict)
         self.run_logs = defaultdict(lambda: defaultdict(list))
+        self.run_device_logs = defaultdict(lambda: defaultdict(list))
         self.run_stop = defaultdict(bool)
         self.run_instances = {}
-        libraries = ("netmiko", "napalm", "scrapli", "ncclient")
+        libraries = ("netmiko", "napalm", "scrapli", "ncclient", "paramiko")
         self.connections_cache = {library: defaultdict(dict) for library in libraries}
         self.service_run_count = defaultdict(int)
+        self.template_cache = OrderedDict()
+        self.template_cache_lock = Lock()
+        self.template_cache_stats = Counter()
+        self.view_cache = OrderedDict()
+        self.view_cache_lock = Lock()
+        self.sandbox_pool = None
+        stream_limit = self.settings["automation"]["state_stream_limit"]
+        self.state_stream_slots = Semaphore(stream_limit)
+        self.jobs = {}
+        self.sandbox_lock = Lock()
 
     def set_template_context(self):
         self.template_context = {
@@ -226,6 +236,66 @@ class VariableStore:
                 error(f"Could not load plugin settings '{path.stem}':\n{format_exc()}")
                 continue
 
+    def get_driver_registry(self):
+        libraries = ("napalm", "ncclient", "netmiko", "scrapli")
+        versions = {library: self.get_library_version(library) for library in libraries}
+        registry_path = self.cache_path / "drivers.json"
+        try:
+            with open(registry_path, "r") as file:
+                registry = load(file)
+        except (OSError, ValueError):
+            registry = {}
+        if registry.get("versions") == versions:
+            if not versions["scrapli"]:
+                warn("Couldn't import scrapli module (not installed)")
+            return registry["drivers"]
+        registry = {"versions": versions, "drivers": self.load_drivers()}
+        try:
+            registry_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(registry_path, "w") as file:
+                dump(registry, file)
+        except OSError as exc:
+            warn(f"Couldn't save the driver registry ({exc})")
+        return registry["drivers"]
+
+    def get_library_version(self, library):
+        try:
+            return version(library)
+        except PackageNotFoundError:
+            return None
+
+    def load_drivers(self):
+        napalm_drivers = import_module("napalm._SUPPORTED_DRIVERS").SUPPORTED_DRIVERS
+        ncclient_drivers = import_module("ncclient.devices").supported_devices_cfg
+        netmiko_drivers = import_module("netmiko.ssh_dispatcher").CLASS_MAPPER
+        try:
+            scrapli_drivers = import_module("scrapli").Scrapli.CORE_PLATFORM_MAP
+        except ImportError as exc:
+            scrapli_drivers = ["cisco_iosxe"]
+            warn(f"Couldn't import scrapli module ({exc})")
+        return {
+            "napalm": sorted(self.dualize(napalm_drivers[1:])),
+            "netconf": sorted(self.dualize(ncclient_drivers)),
+            "netmiko": sorted(self.dualize(netmiko_drivers)),
+            "scrapli": sorted(self.dualize(scrapli_drivers)),
+        }
+
+    @contextmanager
+    def profile_startup(self, step):
+        start_time = perf_counter()
+        try:
+            yield
+        finally:
+            self.startup_profile[step] = perf_counter() - start_time
+
+    def log_startup_profile(self):
+        settings = self.settings["app"]["startup_profiling"]
+        if not settings["active"]:
+            return
+        steps = sorted(self.startup_profile.items(), key=lambda step: -step[1])
+        for step, duration in steps[: settings["max_steps"]]:
+            info(f"Startup profiling - {step}: {duration:.3f}s")
+
     def dualize(self, iterable):
         return [(element, element) for element in iterable]
 
@@ -259,6 +329,52 @@ class VariableStore:
 
         return old
 
+    def get_device_path(self, device_name, path=None):
+        path = Path(self.path / "network_data" if path is None else path)
+        shard_length = self.settings["app"]["git_shard_length"]
+        if shard_length:
+            path /= sha1(device_name.encode("utf-8")).hexdigest()[:shard_length]
+        return path / device_name
+
+    def get_template(self, key, factory):
+        with self.template_cache_lock:
+            if key in self.template_cache:
+                self.template_cache_stats["hits"] += 1
+                self.template_cache.move_to_end(key)
+                return self.template_cache[key]
+            self.template_cache_stats["misses"] += 1
+        template = factory()
+        with self.template_cache_lock:
+            self.template_cache[key] = template
+            if len(self.template_cache) > self.automation["template_cache"]["size"]:
+                self.template_cache.popitem(last=False)
+                self.template_cache_stats["evictions"] += 1
+        return template
+
+    def get_template_cache_stats(self):
+        with self.template_cache_lock:
+            return {
+                **self.template_cache_stats,
+                "size": len(self.template_cache),
+                "types": Counter(key[0] for key in self.template_cache),
+            }
+
+    def get_view(self, key, factory):
+        settings = self.visualization["geographical"]["clustering"]
+        with self.view_cache_lock:
+            if key in self.view_cache:
+                timestamp, view = self.view_cache[key]
+                if monotonic() - timestamp < settings["cache_ttl"]:
+                    self.view_cache.move_to_end(key)
+                    return view
+        view = factory()
+        with self.view_cache_lock:
+            self.view_cache[key] = (monotonic(), view)
+            self.view_cache.move_to_end(key)
+            if len(self.view_cache) > settings["cache_size"]:
+                self.view_cache.popitem(last=False)
+        return view
+
     def get_time(self):
         return str(datetime.now())
 
@@ -0,0 +1,61 @@
+from copy import deepcopy
+from importlib.util import module_from_spec, spec_from_file_location
+from pathlib import Path
+from random import randrange, seed
+from timeit import timeit
+
+# Loaded by path: importing it through the eNMS package would start the app.
+path = Path(__file__).resolve().parents[2] / "eNMS" / "matching.py"
+spec = spec_from_file_location("matching", path)
+matching = module_from_spec(spec)
+spec.loader.exec_module(matching)
+DictionaryMatch = matching.DictionaryMatch
+
+DEVICES = 5000
+INTERFACES = 2000
+
+
+def legacy_match_dictionary(result, match, first=True):
+    copy = deepcopy(match) if first else match
+    if isinstance(result, dict):
+        for k, v in result.items():
+            if isinstance(copy.get(k), list) and isinstance(v, list):
+                for item in v:
+                    try:
+                        copy[k].remove(item)
+                    except ValueError:
+                        pass
+                pop_key = not copy[k]
+            else:
+                pop_key = k in copy and copy[k] == v
+            copy.pop(k) if pop_key else legacy_match_dictionary(v, copy, False)
+    elif isinstance(result, list):
+        for item in result:
+            legacy_match_dictionary(item, copy, False)
+    return not copy
+
+
+def generate_result(index):
+    interfaces = [
+        {"name": f"Ethernet{port}", "vlan": randrange(1, 4096), "up": True}
+        for port in range(INTERFACES)
+    ]
+    return {
+        "hostname": f"router{index}",
+        "version": "15.2",
+        "interfaces": interfaces,
+        "vlans": list(range(1, INTERFACES)),
+    }
+
+
+seed(0)
+results = [generate_result(index) for index in range(10)]
+match = {"version": "15.2", "vlans": list(range(1, INTERFACES, 2))}
+matcher = DictionaryMatch(match)
+for result in results:
+    assert legacy_match_dictionary(result, match) == matcher(result)
+legacy = timeit(lambda: [legacy_match_dictionary(r, match) for r in results], number=5)
+compiled = timeit(lambda: [matcher(r) for r in results], number=5)
+scale = DEVICES / (len(results) * 5)
+print(f"Legacy match: {legacy * scale:.2f}s for {DEVICES} devices")
+print(f"Compiled match: {compiled * scale:.2f}s for {DEVICES} devices")
@@ -4,5 +4,6 @@ limit_request_line = 0
 loglevel = "debug"
 preload_app = True
 raw_env = ["TERM=screen"]
+threads = 200
 timeout = 3000
 workers = 1
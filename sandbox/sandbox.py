@@ -0,0 +1,100 @@
+from builtins import __dict__ as builtins
+from functools import partial
+from psutil import Process
+from resource import getrlimit, getrusage, RLIMIT_AS, RLIMIT_CPU, RUSAGE_SELF, setrlimit
+from signal import alarm, SIGALRM, signal
+from traceback import extract_tb, format_exc
+
+forbidden_libraries = set()
+
+
+def update_payload(
+    payload,
+    name,
+    value=None,
+    device=None,
+    section=None,
+    operation="__setitem__",
+    allow_none=False,
+    default=None,
+):
+    payload = payload.setdefault("variables", {})
+    if device:
+        payload = payload.setdefault("devices", {})
+        payload = payload.setdefault(device, {})
+    if section:
+        payload = payload.setdefault(section, {})
+    if value is None:
+        value = default
+    if operation in ("get", "__setitem__", "setdefault"):
+        value = getattr(payload, operation)(name, value)
+    else:
+        getattr(payload[name], operation)(value)
+    if operation == "get" and not allow_none and value is None:
+        raise Exception(f"Payload Editor: {name} not found in {payload}.")
+    else:
+        return value
+
+
+def init_sandbox(memory_limit, restricted_libraries):
+    forbidden_libraries.update(restricted_libraries)
+    if memory_limit:
+        address_space = Process().memory_info().vms + memory_limit * 1024**2
+        setrlimit(RLIMIT_AS, (address_space,) * 2)
+
+
+def restricted_import(module, *args, **kwargs):
+    if module in forbidden_libraries:
+        raise ImportError(f"Module '{module}' is restricted.")
+    return __import__(module, *args, **kwargs)
+
+
+def run_sandbox(code, function, variables, timeout):
+    output, payload = {"logs": [], "updates": []}, variables["payload"]
+    results = variables.setdefault("results", {})
+
+    def interrupt(*_):
+        raise TimeoutError(f"Execution exceeded the {timeout}s sandbox timeout.")
+
+    def save_result(success, result, **kwargs):
+        results.update({"success": success, "result": result, **kwargs})
+        if kwargs.get("exit"):
+            raise SystemExit()
+
+    def set_var(*args, **kwargs):
+        output["updates"].append((args, kwargs))
+        return update_payload(payload, *args, **kwargs)
+
+    def log(severity, content, *args, **kwargs):
+        output["logs"].append((severity, str(content)))
+
+    variables.update(
+        {
+            "__builtins__": {**builtins, "__import__": restricted_import},
+            "get_var": partial(update_payload, payload, operation="get"),
+            "log": log,
+            "save_result": save_result,
+            "set_var": set_var,
+        }
+    )
+    cpu_time = getrusage(RUSAGE_SELF)
+    cpu_limit = int(cpu_time.ru_utime + cpu_time.ru_stime) + timeout + 1
+    setrlimit(RLIMIT_CPU, (cpu_limit, getrlimit(RLIMIT_CPU)[1]))
+    signal(SIGALRM, interrupt)
+    alarm(timeout)
+    try:
+        output["value"] = builtins[function](code, variables)
+    except SystemExit:
+        pass
+    except BaseException as exc:
+        output["error"] = {
+            "error": str(exc),
+            "line": extract_tb(exc.__traceback__)[-1][1],
+            "traceback": format_exc(),
+        }
+    finally:
+        alarm(0)
+    output["variables"] = {
+        key: variables[key] for key in ("results", "retries") if key in variables
+    }
+    return output